@@ -0,0 +1,99 @@
+"""
+In-process approximate nearest neighbour indexes over the stored embeddings
+
+Used by VectorStoreManager when config.VECTOR_BACKEND is not "chroma": the
+search runs in memory and Chroma is only asked for the matching documents.
+"""
+import logging
+
+import numpy as np
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class HnswIndex:
+    """HNSW graph index built with hnswlib"""
+
+    def __init__(self, embeddings: np.ndarray, m: int = 16, ef_construction: int = 200):
+        """
+        Build the index over an embedding matrix
+
+        Args:
+            embeddings: (N, D) matrix; row i gets label i
+            m: Number of graph neighbours per node
+            ef_construction: Candidate list size while building
+        """
+        import hnswlib  # Optional dependency, only needed for this backend
+
+        count, dim = embeddings.shape
+        # "ip" returns 1 - dot product, the same distances Chroma reports
+        # for an "ip" collection
+        self.index = hnswlib.Index(space="ip", dim=dim)
+        self.index.init_index(max_elements=max(count, 1), ef_construction=ef_construction, M=m)
+        self.index.add_items(np.asarray(embeddings, dtype=np.float32), np.arange(count))
+        self.count = count
+        logger.info(f"Built HNSW index over {count} vectors")
+
+    def search(self, queries: np.ndarray, k: int):
+        """
+        Find the k nearest stored vectors for each query
+
+        Args:
+            queries: (Q, D) matrix of query embeddings
+            k: Number of neighbours per query
+
+        Returns:
+            Tuple of (distances, positions), both (Q, k) arrays
+        """
+        k = min(k, self.count)
+        self.index.set_ef(max(50, k))
+        positions, distances = self.index.knn_query(np.asarray(queries, dtype=np.float32), k=k)
+        return distances, positions
+
+
+class FaissIndex:
+    """HNSW index built with FAISS, optionally over 8-bit scalar-quantized vectors"""
+
+    def __init__(self, embeddings: np.ndarray, m: int = 32, ef_construction: int = 200,
+                 int8: bool = False):
+        """
+        Build the index over an embedding matrix
+
+        Args:
+            embeddings: (N, D) matrix; row i gets label i
+            m: Number of graph neighbours per node
+            ef_construction: Candidate list size while building
+            int8: Store vectors as 8-bit codes (4x less memory than float32)
+        """
+        import faiss  # Optional dependency, only needed for this backend
+
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        dim = matrix.shape[1]
+        metric = faiss.METRIC_INNER_PRODUCT
+        if int8:
+            self.index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, m, metric)
+            self.index.train(matrix)
+        else:
+            self.index = faiss.IndexHNSWFlat(dim, m, metric)
+        self.index.hnsw.efConstruction = ef_construction
+        self.index.add(matrix)
+        logger.info(f"Built FAISS HNSW index over {len(matrix)} vectors")
+
+    def search(self, queries: np.ndarray, k: int):
+        """
+        Find the k nearest stored vectors for each query
+
+        Args:
+            queries: (Q, D) matrix of query embeddings
+            k: Number of neighbours per query
+
+        Returns:
+            Tuple of (distances, positions), both (Q, k) arrays; missing
+            neighbours have position -1
+        """
+        self.index.hnsw.efSearch = max(64, k)
+        similarities, positions = self.index.search(np.ascontiguousarray(queries, dtype=np.float32), k)
+        # FAISS returns inner products; report 1 - ip like the other backends
+        return 1.0 - similarities, positions
@@ -2,13 +2,142 @@
 Streamlit UI for RAG Chatbot
 """
 import streamlit as st
+import json
 import logging
+import time
+import uuid
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from os.path import basename
 from pathlib import Path
-from datetime import datetime
 
 import config
-from rag_engine import RAGManager
-from document_processor import DocumentProcessor
+import doc_stats
+from styles import STYLE_TAG
+
+# Lightweight view of a source document stored with each answer
+SourcePreview = namedtuple("SourcePreview", ["file", "preview"])
+
+# Static main page HTML, rendered with st.html (no markdown parsing)
+_HEADER_HTML = """
+<h1 class="main-header">🤖 RAG Knowledge Base Chatbot</h1>
+<p class="sub-header">✨ Ask intelligent questions about your custom knowledge base ✨</p>
+"""
+
+_WELCOME_HTML = """
+<div class="welcome-box">
+    <h2>👋 Welcome to Your RAG CHATBOT created by RADHA!</h2>
+    <p style="font-size: 1.1rem; margin-top: 1rem;">
+        Get started by clicking <strong>🚀 Initialize</strong> in the sidebar
+    </p>
+</div>
+"""
+
+_TRY_ASKING_HTML = """
+<div class="info-box">
+    <p style="margin:0; font-size: 1.05rem;">
+        <strong>💡 Try asking:</strong><br>
+        • "What is Retrieval-Augmented Generation?"<br>
+        • "How do vector databases work?"<br>
+        • "What are the best practices for RAG?"
+    </p>
+</div>
+"""
+
+_FOOTER_HTML = """
+<div style='text-align: center; padding: 1rem;'>
+    <p style='color: #999; font-size: 0.95rem; margin: 0;'>
+        ⚡ Powered by <strong>LangChain</strong> • <strong>ChromaDB</strong> • <strong>Sentence Transformers</strong>
+    </p>
+    <p style='color: #999; font-size: 0.9rem; margin-top: 0.5rem;'>
+        Contact <strong>@radha/SharmaRadha-hub</strong>
+    </p>
+</div>
+"""
+
+# Static sidebar HTML, built once at import
+_SIDEBAR_HEADER_HTML = """
+<div style='text-align: center; padding: 1rem 0; background: var(--grad-primary); 
+            border-radius: 10px; margin-bottom: 1rem; box-shadow: 0 4px 12px rgba(0,0,0,0.15);'>
+    <h2 style='color: white; margin: 0; font-size: 1.5rem; font-weight: 800;'>
+        🎛️ Control Panel
+    </h2>
+</div>
+"""
+
+_KB_HEADER_HTML = """
+<div style='background: var(--grad-green); 
+            padding: 1rem; border-radius: 10px; margin-bottom: 1rem;'>
+    <h3 style='color: #1B5E20; margin: 0 0 0.8rem 0; font-size: 1.2rem; font-weight: 700;'>
+        📊 Knowledge Base
+    </h3>
+</div>
+"""
+
+_STATS_TPL = """
+<div class="stats-box" style='margin-top: -0.5rem;'>
+    <div class="stats-item" style='font-size: 1rem; padding: 0.5rem 0;'>
+        <strong style='color: #000; font-size: 1.05rem;'>📄 Documents:</strong> 
+        <span style='color: #1B5E20; font-weight: 600;'>{docs}</span>
+    </div>
+    <div class="stats-item" style='font-size: 1rem; padding: 0.5rem 0;'>
+        <strong style='color: #000; font-size: 1.05rem;'>🧩 Chunks:</strong> 
+        <span style='color: #1B5E20; font-weight: 600;'>{chunks}</span>
+    </div>
+    <div class="stats-item" style='font-size: 1rem; padding: 0.5rem 0;'>
+        <strong style='color: #000; font-size: 1.05rem;'>💾 Size:</strong> 
+        <span style='color: #1B5E20; font-weight: 600;'>{size_mb:.2f} MB</span>
+    </div>
+    <div class="stats-item" style='font-size: 1rem; padding: 0.5rem 0;'>
+        <strong style='color: #000; font-size: 1.05rem;'>📁 Types:</strong> 
+        <span style='color: #1B5E20; font-weight: 600;'>{types}</span>
+    </div>
+</div>
+"""
+
+_NOT_INITIALIZED_HTML = """
+<div style='background: var(--grad-blue); 
+            padding: 1.2rem; border-radius: 10px; border-left: 5px solid #03A9F4; 
+            box-shadow: var(--shadow-sm);'>
+    <p style='margin: 0; color: #000; font-weight: 600; font-size: 1rem;'>
+        <strong>ℹ️ Not Initialized</strong><br>
+        <span style='color: #1565C0;'>Click 🚀 Initialize to start</span>
+    </p>
+</div>
+"""
+
+_ACTIONS_DIVIDER_HTML = """
+<div style='background: linear-gradient(135deg, #FFEBEE 0%, #FFCDD2 100%); 
+            padding: 0.5rem; border-radius: 8px; margin: 1rem 0;'>
+</div>
+"""
+
+_QUICK_GUIDE_HTML = """
+<div style='background: var(--grad-yellow); 
+            padding: 1rem; border-radius: 10px; border: 2px solid #F9A825; 
+            box-shadow: 0 3px 10px rgba(0,0,0,0.1);'>
+    <h3 style='color: #000; margin: 0 0 0.8rem 0; font-size: 1.2rem; font-weight: 700;'>
+        📖 Quick Guide
+    </h3>
+    <div style='color: #000; font-size: 0.95rem; line-height: 1.8;'>
+        <p style='margin: 0.5rem 0; font-weight: 600;'><strong>🚀 Getting Started:</strong></p>
+        <p style='margin: 0.3rem 0; padding-left: 1rem;'>
+            <strong>1.</strong> 📁 Add documents to <code style='background: #FFE082; padding: 2px 6px; border-radius: 3px; color: #000;'>documents/</code> folder<br>
+            <strong>2.</strong> 🚀 Click <strong>Initialize</strong> button<br>
+            <strong>3.</strong> 💬 Ask questions about your docs<br>
+            <strong>4.</strong> 📚 View sources for references
+        </p>
+        <p style='margin: 0.8rem 0 0.3rem 0; font-weight: 600;'><strong>📄 Supported Files:</strong></p>
+        <p style='margin: 0.3rem 0; padding-left: 1rem;'>
+            • <strong>PDF</strong> (.pdf) - Reports, papers<br>
+            • <strong>Text</strong> (.txt) - Notes, data<br>
+            • <strong>Markdown</strong> (.md) - Documentation<br>
+            • <strong>Word</strong> (.docx) - Documents
+        </p>
+    </div>
+</div>
+"""
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -22,351 +151,325 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for better UI
-st.markdown("""
-<style>
-    /* Main container styling */
-    .main {
-        background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-    }
-    
-    /* Header styling */
-    .main-header {
-        font-size: 3rem;
-        font-weight: 800;
-        text-align: center;
-        padding: 2rem 1rem 1rem 1rem;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        margin-bottom: 0.5rem;
-        text-shadow: 2px 2px 4px rgba(0,0,0,0.1);
-    }
-    
-    .sub-header {
-        text-align: center;
-        color: #2c3e50;
-        font-size: 1.1rem;
-        margin-bottom: 2rem;
-        font-weight: 500;
-    }
-    
-    /* Chat message styling */
-    .chat-message {
-        padding: 1.2rem;
-        border-radius: 12px;
-        margin-bottom: 1.2rem;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        border-left: 5px solid;
-        animation: slideIn 0.3s ease-out;
-    }
-    
-    @keyframes slideIn {
-        from {
-            opacity: 0;
-            transform: translateY(10px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    .user-message {
-        background: linear-gradient(135deg, #E3F2FD 0%, #BBDEFB 100%);
-        border-left-color: #2196F3;
-    }
-    
-    .assistant-message {
-        background: linear-gradient(135deg, #F3E5F5 0%, #E1BEE7 100%);
-        border-left-color: #9C27B0;
-    }
-    
-    .message-label {
-        font-weight: 700;
-        font-size: 1.1rem;
-        margin-bottom: 0.5rem;
-        display: flex;
-        align-items: center;
-        gap: 0.5rem;
-        color: #000000;
-    }
-    
-    .message-content {
-        line-height: 1.6;
-        font-size: 1rem;
-        color: #1a1a1a;
-        font-weight: 500;
-    }
-    
-    /* Source box styling */
-    .source-box {
-        background: linear-gradient(135deg, #FFF3E0 0%, #FFE0B2 100%);
-        padding: 1rem;
-        border-radius: 10px;
-        margin-top: 0.8rem;
-        border-left: 4px solid #FF9800;
-        font-size: 0.95rem;
-        box-shadow: 0 2px 6px rgba(0,0,0,0.08);
-    }
-    
-    .source-header {
-        font-weight: 700;
-        color: #b71c1c;
-        margin-bottom: 0.5rem;
-    }
-    
-    .source-content {
-        color: #212121;
-        line-height: 1.5;
-        font-weight: 500;
-    }
-    
-    /* Stats box styling */
-    .stats-box {
-        background: linear-gradient(135deg, #E8F5E9 0%, #C8E6C9 100%);
-        padding: 1.2rem;
-        border-radius: 12px;
-        border: 2px solid #4CAF50;
-        box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-        margin-bottom: 1rem;
-    }
-    
-    .stats-title {
-        font-weight: 700;
-        color: #1B5E20;
-        font-size: 1.1rem;
-        margin-bottom: 0.8rem;
-    }
-    
-    .stats-item {
-        padding: 0.3rem 0;
-        color: #000000;
-        font-size: 0.95rem;
-        font-weight: 500;
-    }
-    
-    /* Button styling */
-    .stButton>button {
-        width: 100%;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        padding: 0.7rem 1rem;
-        font-weight: 700;
-        font-size: 1rem;
-        border-radius: 8px;
-        transition: all 0.3s ease;
-        box-shadow: 0 4px 12px rgba(102, 126, 234, 0.4);
-    }
-    
-    .stButton>button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 16px rgba(102, 126, 234, 0.6);
-    }
-    
-    /* Info box styling */
-    .info-box {
-        background: linear-gradient(135deg, #E1F5FE 0%, #B3E5FC 100%);
-        padding: 1.2rem;
-        border-radius: 12px;
-        border-left: 5px solid #03A9F4;
-        margin: 1rem 0;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-        color: #1a1a1a;
-    }
-    
-    .info-box h3 {
-        color: #000000;
-    }
-    
-    .info-box p, .info-box li {
-        color: #212121;
-        font-weight: 500;
-    }
-    
-    .info-box strong {
-        color: #000000;
-    }
-    
-    /* Welcome box */
-    .welcome-box {
-        background: linear-gradient(135deg, #FFF9C4 0%, #FFF59D 100%);
-        padding: 1.5rem;
-        border-radius: 12px;
-        border: 2px solid #FBC02D;
-        margin: 2rem 0;
-        box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-        text-align: center;
-    }
-    
-    .welcome-box h2 {
-        color: #000000;
-    }
-    
-    .welcome-box p {
-        color: #1a1a1a;
-        font-weight: 500;
-    }
-    
-    .welcome-box strong {
-        color: #000000;
-    }
-    
-    /* Sidebar styling */
-    section[data-testid="stSidebar"] {
-        background: linear-gradient(180deg, #f8f9fa 0%, #e9ecef 100%);
-    }
-    
-    /* Expander styling */
-    .streamlit-expanderHeader {
-        background-color: #FFF3E0;
-        border-radius: 8px;
-        font-weight: 600;
-    }
-    
-    /* Chat input styling */
-    .stChatInputContainer {
-        border-top: 2px solid #E0E0E0;
-        padding-top: 1rem;
-        background: white;
-    }
-    
-    /* Divider styling */
-    hr {
-        margin: 2rem 0;
-        border: none;
-        height: 2px;
-        background: linear-gradient(90deg, transparent, #9C27B0, transparent);
-    }
-    
-    /* Global text color overrides */
-    .main .block-container {
-        color: #1a1a1a;
-    }
-    
-    /* Streamlit markdown text */
-    .main p, .main li, .main span {
-        color: #212121 !important;
-        font-weight: 500;
-    }
-    
-    /* Sidebar text */
-    section[data-testid="stSidebar"] .stMarkdown {
-        color: #1a1a1a;
-    }
-    
-    section[data-testid="stSidebar"] p, 
-    section[data-testid="stSidebar"] li {
-        color: #212121 !important;
-        font-weight: 500;
-    }
-    
-    /* Success/Info/Warning text */
-    .stSuccess, .stInfo, .stWarning {
-        color: #000000 !important;
-    }
-    
-    /* Caption text - make darker */
-    .stCaption {
-        color: #424242 !important;
-        font-weight: 500 !important;
-    }
-    
-    /* Code blocks */
-    code {
-        color: #000000 !important;
-        font-weight: 600;
-    }
-</style>
-""", unsafe_allow_html=True)
+
+def _inject_css():
+    """
+    Add the custom CSS to the page
+    
+    Streamlit drops any element that is not re-emitted during a rerun, so
+    this must run every time. The stylesheet is read from static/style.css
+    once at import and emitted with st.html, bypassing the markdown parser.
+    """
+    st.html(STYLE_TAG)
+
+
+@st.cache_resource
+def get_rag_manager():
+    """
+    RAGManager shared by all sessions
+    
+    The embedding model and vector store are loaded once per process rather
+    than once per browser tab. Initialization itself runs in the background
+    (see initialize_rag_system).
+    """
+    # Imported lazily: pulls in langchain, chromadb and the embedding model
+    from rag_engine import RAGManager
+    return RAGManager()
+
+
+@st.cache_resource
+def _welcome_html():
+    """Document location and quick start boxes for the welcome screen"""
+    left = f"""
+    <div class="info-box">
+        <h3 style="margin-top:0;">📁 Document Location</h3>
+        <p><code>{config.DOCUMENTS_DIR}</code></p>
+        <p><strong>Supported Formats:</strong></p>
+        <ul style="margin-bottom:0;">
+            <li>📄 PDF files (.pdf)</li>
+            <li>📝 Text files (.txt)</li>
+            <li>📋 Markdown (.md)</li>
+            <li>📃 Word docs (.docx)</li>
+        </ul>
+    </div>
+    """
+    right = """
+    <div class="info-box">
+        <h3 style="margin-top:0;">🚀 Quick Start</h3>
+        <ol style="margin-bottom:0;">
+            <li><strong>Add Documents</strong><br>Place files in the documents folder</li>
+            <li><strong>Initialize System</strong><br>Click 🚀 button in sidebar</li>
+            <li><strong>Start Chatting</strong><br>Ask questions about your docs!</li>
+        </ol>
+    </div>
+    """
+    return left, right
+
+
+@st.cache_data(ttl=30)
+def _get_stats():
+    """Document statistics, refreshed at most every 30 seconds"""
+    return doc_stats.get_document_stats(config.DOCUMENTS_DIR)
+
+
+@st.cache_data(ttl=10)
+def _get_collection_count(_rag_manager, session_token):
+    """
+    Number of chunks in the vector store, refreshed at most every 10 seconds
+    
+    Args:
+        _rag_manager: RAGManager to query (excluded from the cache key)
+        session_token: Cache key identifying the session's current index
+    """
+    return _rag_manager.vector_store_manager.get_collection_count()
 
 
 def initialize_session_state():
     """Initialize Streamlit session state variables"""
-    if 'rag_manager' not in st.session_state:
-        st.session_state.rag_manager = None
+    if 'dirs_ready' not in st.session_state:
+        config.ensure_dirs()
+        st.session_state.dirs_ready = True
+    if 'session_id' not in st.session_state:
+        # Kept in the URL so a page reload picks up the same transcript
+        session_id = st.query_params.get("sid")
+        if not session_id or not session_id.isalnum():
+            session_id = uuid.uuid4().hex
+            st.query_params["sid"] = session_id
+        st.session_state.session_id = session_id
     if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = load_chat_history(st.session_state.session_id)
     if 'initialized' not in st.session_state:
         st.session_state.initialized = False
     if 'processing' not in st.session_state:
         st.session_state.processing = False
+    if 'show_all' not in st.session_state:
+        st.session_state.show_all = False
+    if 'index_token' not in st.session_state:
+        st.session_state.index_token = 0
+    if 'init_future' not in st.session_state:
+        st.session_state.init_future = None
 
 
-def initialize_rag_system(force_rebuild=False):
-    """Initialize or reinitialize the RAG system"""
-    with st.spinner('🔄 Initializing RAG system... This may take a moment.'):
-        try:
-            if st.session_state.rag_manager is None:
-                st.session_state.rag_manager = RAGManager()
-            
-            success = st.session_state.rag_manager.initialize(force_rebuild=force_rebuild)
-            
-            if success:
-                st.session_state.initialized = True
-                st.success('✅ RAG system initialized successfully!')
-                return True
-            else:
-                st.error('❌ Failed to initialize RAG system. Please check if documents are available.')
-                return False
-        except Exception as e:
-            st.error(f'❌ Error initializing RAG system: {str(e)}')
-            logger.error(f"Initialization error: {str(e)}")
-            return False
-
-
-def display_chat_history():
-    """Display the chat history with enhanced styling"""
-    for message in st.session_state.chat_history:
-        if message['role'] == 'user':
-            st.markdown(
-                f'''<div class="chat-message user-message">
-                    <div class="message-label">👤 You</div>
-                    <div class="message-content">{message["content"]}</div>
-                </div>''',
-                unsafe_allow_html=True
-            )
-        else:
-            st.markdown(
-                f'''<div class="chat-message assistant-message">
-                    <div class="message-label">🤖 AI Assistant</div>
-                    <div class="message-content">{message["content"]}</div>
-                </div>''',
-                unsafe_allow_html=True
-            )
+@st.cache_resource
+def _executor():
+    """Single background worker shared by all sessions for RAG initialization"""
+    return ThreadPoolExecutor(max_workers=1)
+
+
+def initialize_rag_system(force_rebuild=False, update_only=False):
+    """
+    Start initializing the RAG system in the background
+    
+    Args:
+        force_rebuild: Rebuild the vector store from scratch
+        update_only: Only re-index documents added, changed or removed since
+            the last indexing run
+    """
+    if st.session_state.init_future is not None:
+        st.info('⏳ Initialization already in progress')
+        return
+    
+    try:
+        rag_manager = get_rag_manager()
+        
+        if update_only:
+            st.session_state.init_future = _executor().submit(rag_manager.update_documents)
+            return
+        
+        # Another session may already have initialized the shared manager
+        if rag_manager.is_initialized and not force_rebuild:
+            st.session_state.initialized = True
+            st.success('✅ RAG system initialized successfully!')
+            return
+        
+        st.session_state.init_future = _executor().submit(
+            rag_manager.initialize,
+            force_rebuild=force_rebuild
+        )
+    except Exception as e:
+        st.error(f'❌ Error initializing RAG system: {str(e)}')
+        logger.error(f"Initialization error: {str(e)}")
+
+
+def check_rag_initialization():
+    """Report the state of a background initialization started by initialize_rag_system"""
+    future = st.session_state.init_future
+    if future is None:
+        return
+    
+    if not future.done():
+        st.info('🔄 Initializing RAG system... This may take a moment.')
+        return
+    
+    st.session_state.init_future = None
+    try:
+        success = future.result()
+    except Exception as e:
+        st.error(f'❌ Error initializing RAG system: {str(e)}')
+        logger.error(f"Initialization error: {str(e)}")
+        return
+    
+    if success:
+        st.session_state.initialized = True
+        st.session_state.index_token += 1
+        st.success('✅ RAG system initialized successfully!')
+    else:
+        st.error('❌ Failed to initialize RAG system. Please check if documents are available.')
+
+
+def _session_file(session_id):
+    """Path of the JSONL transcript for a session"""
+    return config.SESSIONS_DIR / f"{session_id}.jsonl"
+
+
+def load_chat_history(session_id):
+    """
+    Load the tail of a session's transcript
+    
+    Only the last config.CHAT_HISTORY_MAX lines are kept while reading, so
+    long transcripts are never held in memory in full.
+    
+    Args:
+        session_id: Session whose transcript to load
+        
+    Returns:
+        Bounded deque of message dicts
+    """
+    chat_history = deque(maxlen=config.CHAT_HISTORY_MAX)
+    path = _session_file(session_id)
+    
+    if not path.exists():
+        return chat_history
+    
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = deque(f, maxlen=config.CHAT_HISTORY_MAX)
+        for line in lines:
+            record = json.loads(line)
+            record['sources'] = [SourcePreview(**source) for source in record.get('sources', [])]
+            chat_history.append(record)
+    except (OSError, ValueError, TypeError) as e:
+        logger.error(f"Error loading chat history: {str(e)}")
+    
+    return chat_history
+
+
+def append_message(chat_history, message):
+    """
+    Append a message to the bounded chat history
+    
+    Every message is also appended to the session's transcript in
+    config.SESSIONS_DIR in a compact form (no Document objects), so the
+    in-memory history can stay small and survive a page reload.
+    
+    Args:
+        chat_history: deque holding the session's messages
+        message: Message dict to append
+    """
+    record = {
+        'id': message['id'],
+        'role': message['role'],
+        'content': message['content'],
+        'timestamp': message['timestamp'],
+        'sources': [source._asdict() for source in message.get('sources', [])]
+    }
+    try:
+        with open(_session_file(st.session_state.session_id), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        logger.error(f"Error saving chat history: {str(e)}")
+    
+    chat_history.append(message)
+
+
+def display_chat_history(chat_history):
+    """
+    Display the chat history with enhanced styling
+    
+    Args:
+        chat_history: deque of message dicts to render
+    """
+    visible = chat_history
+    
+    # Only render the most recent messages unless the user asked for all of them
+    hidden = len(chat_history) - config.CHAT_HISTORY_WINDOW
+    if hidden > 0 and not st.session_state.show_all:
+        visible = islice(chat_history, hidden, None)
+        st.markdown(
+            f'''<div class="info-box" style="text-align: center; padding: 0.6rem;">
+                <p style="margin:0;">⋯ {hidden} earlier message(s) hidden</p>
+            </div>''',
+            unsafe_allow_html=True
+        )
+        if st.button("📜 Show all messages"):
+            st.session_state.show_all = True
+            st.rerun(scope="fragment")
+    
+    for message in visible:
+        with st.chat_message(message['role']):
+            st.markdown(message['content'])
             
             # Display sources if available
-            if 'sources' in message and message['sources']:
-                with st.expander("📚 View Source Documents", expanded=False):
-                    for i, source in enumerate(message['sources'], 1):
-                        content = source.page_content[:250] + "..." if len(source.page_content) > 250 else source.page_content
-                        metadata = source.metadata
-                        source_file = metadata.get("source", "Unknown")
-                        if "\\" in source_file:
-                            source_file = source_file.split("\\")[-1]
-                        
-                        st.markdown(
-                            f'''<div class="source-box">
-                                <div class="source-header">📄 Source {i}: {source_file}</div>
-                                <div class="source-content">{content}</div>
-                            </div>''',
-                            unsafe_allow_html=True
-                        )
+            if message.get('sources'):
+                display_sources(message)
+
+
+def make_source_preview(source) -> SourcePreview:
+    """
+    Reduce a retrieved Document to what the chat displays
+    
+    Args:
+        source: Source Document returned by the RAG engine
+        
+    Returns:
+        SourcePreview with the file name and a 250 character preview
+    """
+    pc = source.page_content
+    preview = pc[:250] + "..." if len(pc) > 250 else pc
+    return SourcePreview(basename(source.metadata.get("source", "Unknown")), preview)
+
+
+def render_sources_html(sources) -> str:
+    """
+    Build the source box HTML for an answer as a single string
+    
+    Args:
+        sources: SourcePreview entries attached to the message
+        
+    Returns:
+        Concatenated source box HTML
+    """
+    return "".join(
+        f'''<div class="source-box">
+            <div class="source-header">📄 Source {i}: {source.file}</div>
+            <div class="source-content">{source.preview}</div>
+        </div>'''
+        for i, source in enumerate(sources, 1)
+    )
+
+
+def display_sources(message):
+    """
+    Display the sources of an answer in an expander with a single st.html call
+    
+    The HTML is normally built once when the answer is produced; messages
+    restored from a transcript get it on first display.
+    
+    Args:
+        message: Assistant message dict with a non-empty 'sources' list
+    """
+    if 'sources_html' not in message:
+        message['sources_html'] = render_sources_html(message['sources'])
+    
+    with st.expander("📚 View Source Documents", expanded=False):
+        st.html(message['sources_html'])
 
 
 def sidebar():
     """Render the sidebar with controls and information"""
     with st.sidebar:
         # Professional Header with Logo Effect
-        st.markdown("""
-        <div style='text-align: center; padding: 1rem 0; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                    border-radius: 10px; margin-bottom: 1rem; box-shadow: 0 4px 12px rgba(0,0,0,0.15);'>
-            <h2 style='color: white; margin: 0; font-size: 1.5rem; font-weight: 800;'>
-                🎛️ Control Panel
-            </h2>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_SIDEBAR_HEADER_HTML, unsafe_allow_html=True)
         
         # Initialize/Rebuild buttons with enhanced styling
         st.markdown("<div style='margin: 1.5rem 0;'>", unsafe_allow_html=True)
@@ -376,66 +479,45 @@ def sidebar():
                 initialize_rag_system(force_rebuild=False)
         
         with col2:
-            if st.button("🔄 **Rebuild**", use_container_width=True, help="Rebuild database with new documents", type="secondary"):
+            if st.button("🔄 **Rebuild**", use_container_width=True, help="Re-index new, changed or removed documents", type="secondary"):
                 if st.session_state.initialized:
-                    initialize_rag_system(force_rebuild=True)
+                    initialize_rag_system(update_only=True)
                 else:
                     st.warning("⚠️ Please initialize first!")
+        
+        # Needed after changing the chunk size, the embedding backend or
+        # for an index created with an older distance setting
+        if st.button("🧱 **Full Rebuild**", use_container_width=True,
+                     help="Re-chunk and re-embed every document from scratch", type="secondary"):
+            initialize_rag_system(force_rebuild=True)
         st.markdown("</div>", unsafe_allow_html=True)
         
+        check_rag_initialization()
+        
         st.markdown("---")
         
         # Document statistics with enhanced visibility
-        st.markdown("""
-        <div style='background: linear-gradient(135deg, #E8F5E9 0%, #C8E6C9 100%); 
-                    padding: 1rem; border-radius: 10px; margin-bottom: 1rem;'>
-            <h3 style='color: #1B5E20; margin: 0 0 0.8rem 0; font-size: 1.2rem; font-weight: 700;'>
-                📊 Knowledge Base
-            </h3>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_KB_HEADER_HTML, unsafe_allow_html=True)
         
-        if st.session_state.initialized and st.session_state.rag_manager:
+        ss = st.session_state
+        if ss.initialized:
             try:
-                doc_count = st.session_state.rag_manager.vector_store_manager.get_collection_count()
+                doc_count = _get_collection_count(get_rag_manager(), ss.index_token)
                 
                 # Get document stats
-                processor = DocumentProcessor()
-                stats = processor.get_document_stats()
+                stats = _get_stats()
                 
-                st.markdown(f"""
-                <div class="stats-box" style='margin-top: -0.5rem;'>
-                    <div class="stats-item" style='font-size: 1rem; padding: 0.5rem 0;'>
-                        <strong style='color: #000; font-size: 1.05rem;'>📄 Documents:</strong> 
-                        <span style='color: #1B5E20; font-weight: 600;'>{stats['total_files']}</span>
-                    </div>
-                    <div class="stats-item" style='font-size: 1rem; padding: 0.5rem 0;'>
-                        <strong style='color: #000; font-size: 1.05rem;'>🧩 Chunks:</strong> 
-                        <span style='color: #1B5E20; font-weight: 600;'>{doc_count}</span>
-                    </div>
-                    <div class="stats-item" style='font-size: 1rem; padding: 0.5rem 0;'>
-                        <strong style='color: #000; font-size: 1.05rem;'>💾 Size:</strong> 
-                        <span style='color: #1B5E20; font-weight: 600;'>{stats['total_size_mb']:.2f} MB</span>
-                    </div>
-                    <div class="stats-item" style='font-size: 1rem; padding: 0.5rem 0;'>
-                        <strong style='color: #000; font-size: 1.05rem;'>📁 Types:</strong> 
-                        <span style='color: #1B5E20; font-weight: 600;'>{', '.join([f"{k.upper()}({v})" for k, v in stats['by_type'].items()]) if stats['by_type'] else 'None'}</span>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+                types = ', '.join([f"{k.upper()}({v})" for k, v in stats['by_type'].items()]) if stats['by_type'] else 'None'
+                st.markdown(_STATS_TPL.format(
+                    docs=stats['total_files'],
+                    chunks=doc_count,
+                    size_mb=stats['total_size_mb'],
+                    types=types
+                ), unsafe_allow_html=True)
             except Exception as e:
                 st.error("❌ Error loading stats")
         else:
-            st.markdown("""
-            <div style='background: linear-gradient(135deg, #E1F5FE 0%, #B3E5FC 100%); 
-                        padding: 1.2rem; border-radius: 10px; border-left: 5px solid #03A9F4; 
-                        box-shadow: 0 2px 8px rgba(0,0,0,0.08);'>
-                <p style='margin: 0; color: #000; font-weight: 600; font-size: 1rem;'>
-                    <strong>ℹ️ Not Initialized</strong><br>
-                    <span style='color: #1565C0;'>Click 🚀 Initialize to start</span>
-                </p>
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(_NOT_INITIALIZED_HTML, unsafe_allow_html=True)
         
         st.markdown("---")
         
@@ -457,105 +539,97 @@ def sidebar():
         st.markdown("---")
         
         # Action buttons with professional styling
-        st.markdown("""
-        <div style='background: linear-gradient(135deg, #FFEBEE 0%, #FFCDD2 100%); 
-                    padding: 0.5rem; border-radius: 8px; margin: 1rem 0;'>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_ACTIONS_DIVIDER_HTML, unsafe_allow_html=True)
         if st.button("🗑️ **Clear Chat History**", use_container_width=True, help="Clear conversation history", type="secondary"):
-            st.session_state.chat_history = []
-            st.rerun()
+            # Cleared in place (main() holds a reference); the chat area
+            # renders after the sidebar, so no rerun is needed
+            st.session_state.chat_history.clear()
+            _session_file(st.session_state.session_id).unlink(missing_ok=True)
         
         # Instructions with enhanced visibility
         st.markdown("---")
-        st.markdown("""
-        <div style='background: linear-gradient(135deg, #FFF9C4 0%, #FFF59D 100%); 
-                    padding: 1rem; border-radius: 10px; border: 2px solid #F9A825; 
-                    box-shadow: 0 3px 10px rgba(0,0,0,0.1);'>
-            <h3 style='color: #000; margin: 0 0 0.8rem 0; font-size: 1.2rem; font-weight: 700;'>
-                📖 Quick Guide
-            </h3>
-            <div style='color: #000; font-size: 0.95rem; line-height: 1.8;'>
-                <p style='margin: 0.5rem 0; font-weight: 600;'><strong>🚀 Getting Started:</strong></p>
-                <p style='margin: 0.3rem 0; padding-left: 1rem;'>
-                    <strong>1.</strong> 📁 Add documents to <code style='background: #FFE082; padding: 2px 6px; border-radius: 3px; color: #000;'>documents/</code> folder<br>
-                    <strong>2.</strong> 🚀 Click <strong>Initialize</strong> button<br>
-                    <strong>3.</strong> 💬 Ask questions about your docs<br>
-                    <strong>4.</strong> 📚 View sources for references
-                </p>
-                <p style='margin: 0.8rem 0 0.3rem 0; font-weight: 600;'><strong>📄 Supported Files:</strong></p>
-                <p style='margin: 0.3rem 0; padding-left: 1rem;'>
-                    • <strong>PDF</strong> (.pdf) - Reports, papers<br>
-                    • <strong>Text</strong> (.txt) - Notes, data<br>
-                    • <strong>Markdown</strong> (.md) - Documentation<br>
-                    • <strong>Word</strong> (.docx) - Documents
-                </p>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_QUICK_GUIDE_HTML, unsafe_allow_html=True)
+
+
+@st.fragment
+def chat_area(hist, rag):
+    """
+    Render the conversation and handle a new question
+    
+    Runs as a fragment, so submitting a question only re-executes this
+    function instead of the whole script (CSS, sidebar, header).
+    
+    Args:
+        hist: The session's chat history deque
+        rag: Initialized RAGManager used to answer questions
+    """
+    # Display chat history
+    if not hist:
+        st.html(_TRY_ASKING_HTML)
+    
+    display_chat_history(hist)
+    
+    # Chat input
+    question = st.chat_input("💬 Type your question here...")
+    
+    if question:
+        # Add user message to history
+        append_message(hist, {
+            'id': uuid.uuid4().hex,
+            'role': 'user',
+            'content': question,
+            'timestamp': time.time_ns()
+        })
+        
+        with st.chat_message("user"):
+            st.markdown(question)
+        
+        # Stream the response as it is generated
+        response = {}
+        message = {'id': uuid.uuid4().hex, 'role': 'assistant'}
+        with st.chat_message("assistant"):
+            message['content'] = st.write_stream(rag.stream(question, response))
+            message['sources'] = [make_source_preview(src) for src in response.get('source_documents', [])]
+            if message['sources']:
+                message['sources_html'] = render_sources_html(message['sources'])
+                display_sources(message)
+        
+        # Add assistant response to history
+        message['timestamp'] = time.time_ns()
+        append_message(hist, message)
 
 
 def main():
     """Main application function"""
+    _inject_css()
     initialize_session_state()
     
     # Header
-    st.markdown('<h1 class="main-header">🤖 RAG Knowledge Base Chatbot</h1>', unsafe_allow_html=True)
-    st.markdown('<p class="sub-header">✨ Ask intelligent questions about your custom knowledge base ✨</p>', unsafe_allow_html=True)
+    st.html(_HEADER_HTML)
     
     # Sidebar
     sidebar()
     
+    # Bind session state once; each proxy access goes through widget-state merging
+    ss = st.session_state
+    hist = ss.chat_history
+    rag = get_rag_manager() if ss.initialized else None
+    
     # Main chat interface
     st.markdown("---")
     
     # Display initialization status
-    if not st.session_state.initialized:
-        st.markdown("""
-        <div class="welcome-box">
-            <h2>👋 Welcome to Your RAG CHATBOT created by RADHA!</h2>
-            <p style="font-size: 1.1rem; margin-top: 1rem;">
-                Get started by clicking <strong>🚀 Initialize</strong> in the sidebar
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
+    if not ss.initialized:
+        st.html(_WELCOME_HTML)
         
         # Show document directory info
-        doc_dir = config.DOCUMENTS_DIR
-        
+        left, right = _welcome_html()
         col1, col2 = st.columns([1, 1])
-        
-        with col1:
-            st.markdown("""
-            <div class="info-box">
-                <h3 style="margin-top:0;">📁 Document Location</h3>
-                <p><code>{}</code></p>
-                <p><strong>Supported Formats:</strong></p>
-                <ul style="margin-bottom:0;">
-                    <li>📄 PDF files (.pdf)</li>
-                    <li>📝 Text files (.txt)</li>
-                    <li>📋 Markdown (.md)</li>
-                    <li>📃 Word docs (.docx)</li>
-                </ul>
-            </div>
-            """.format(str(doc_dir)), unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown("""
-            <div class="info-box">
-                <h3 style="margin-top:0;">🚀 Quick Start</h3>
-                <ol style="margin-bottom:0;">
-                    <li><strong>Add Documents</strong><br>Place files in the documents folder</li>
-                    <li><strong>Initialize System</strong><br>Click 🚀 button in sidebar</li>
-                    <li><strong>Start Chatting</strong><br>Ask questions about your docs!</li>
-                </ol>
-            </div>
-            """, unsafe_allow_html=True)
+        col1.html(left)
+        col2.html(right)
         
         # Sample documents info
-        from document_processor import DocumentProcessor
-        processor = DocumentProcessor()
-        stats = processor.get_document_stats()
+        stats = _get_stats()
         
         if stats['total_files'] > 0:
             st.success(f"✅ Found {stats['total_files']} document(s) ready to process!")
@@ -565,60 +639,16 @@ def main():
     else:
         # Chat interface
         st.markdown("### 💬 Conversation")
-        
-        # Display chat history
-        if not st.session_state.chat_history:
-            st.markdown("""
-            <div class="info-box">
-                <p style="margin:0; font-size: 1.05rem;">
-                    <strong>💡 Try asking:</strong><br>
-                    • "What is Retrieval-Augmented Generation?"<br>
-                    • "How do vector databases work?"<br>
-                    • "What are the best practices for RAG?"
-                </p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        display_chat_history()
-        
-        # Chat input
-        question = st.chat_input("💬 Type your question here...")
-        
-        if question:
-            # Add user message to history
-            st.session_state.chat_history.append({
-                'role': 'user',
-                'content': question,
-                'timestamp': datetime.now()
-            })
-            
-            # Get response
-            with st.spinner('🔍 Searching knowledge base and generating answer...'):
-                response = st.session_state.rag_manager.query(question)
-            
-            # Add assistant response to history
-            st.session_state.chat_history.append({
-                'role': 'assistant',
-                'content': response['answer'],
-                'sources': response.get('source_documents', []),
-                'timestamp': datetime.now()
-            })
-            
-            # Rerun to display the new messages
-            st.rerun()
+        chat_area(hist, rag)
     
     # Footer
     st.markdown("---")
-    st.markdown("""
-        <div style='text-align: center; padding: 1rem;'>
-            <p style='color: #999; font-size: 0.95rem; margin: 0;'>
-                ⚡ Powered by <strong>LangChain</strong> • <strong>ChromaDB</strong> • <strong>Sentence Transformers</strong>
-            </p>
-            <p style='color: #999; font-size: 0.9rem; margin-top: 0.5rem;'>
-                Contact <strong>@radha/SharmaRadha-hub</strong>
-            </p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.html(_FOOTER_HTML)
+    
+    # Poll a running background initialization
+    if ss.init_future is not None:
+        time.sleep(0.5)
+        st.rerun()
 
 
 if __name__ == "__main__":
@@ -12,23 +12,45 @@ load_dotenv()
 PROJECT_ROOT = Path(__file__).parent
 DOCUMENTS_DIR = PROJECT_ROOT / "documents"
 VECTOR_DB_DIR = PROJECT_ROOT / "vector_db"
+SESSIONS_DIR = PROJECT_ROOT / "sessions"  # Per-session chat transcripts (JSONL)
+
+
+def ensure_dirs():
+    """Create the data directories if they don't exist (called once at startup)"""
+    DOCUMENTS_DIR.mkdir(exist_ok=True)
+    VECTOR_DB_DIR.mkdir(exist_ok=True)
+    SESSIONS_DIR.mkdir(exist_ok=True)
 
-# Create directories if they don't exist
-DOCUMENTS_DIR.mkdir(exist_ok=True)
-VECTOR_DB_DIR.mkdir(exist_ok=True)
 
 # Document Processing Settings
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 SUPPORTED_EXTENSIONS = ['.pdf', '.txt', '.md', '.docx']
+PARALLEL_LOAD_MIN_FILES = 8  # Parse PDF/DOCX files in worker processes when at least this many are found
 
 # Embedding Model Settings
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"  # Fast and efficient
 # Alternative: "all-mpnet-base-v2" for better quality
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hf")  # "hf" (sentence-transformers) or "onnx" (int8, CPU)
+ONNX_MODEL_DIR = PROJECT_ROOT / "onnx"  # Output of embeddings.build_quantized_model()
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "auto")  # "auto", "cuda", "mps" or "cpu"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "128"))
+QUERY_EMBEDDING_CACHE_SIZE = 1024  # Recently asked questions whose embeddings are kept
+EMBEDDING_FP16 = os.getenv("EMBEDDING_FP16", "true").lower() == "true"  # Half precision weights on CUDA
 
 # Vector Database Settings
 COLLECTION_NAME = "rag_knowledge_base"
+CHROMA_INSERT_BATCH_SIZE = 250  # Chunks written per collection.add() call
+EMBED_SLICE_SIZE = 2048  # Chunks embedded per encoder call while the previous slice is written
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # "chroma", "hnswlib" or "faiss" (in-process search)
+FAISS_INT8 = os.getenv("FAISS_INT8", "false").lower() == "true"  # 8-bit scalar-quantized FAISS index
+EMBEDDINGS_SIDECAR = "embeddings.f16"  # float16 memmap of all stored vectors, in the vector store directory
+EMBEDDINGS_SIDECAR_IDS = "embeddings_ids.json"  # Chroma id of each memmap row, next to the memmap
+MANIFEST_PATH = VECTOR_DB_DIR / "manifest.json"  # Indexed files: path -> [mtime_ns, size, sha256]
 TOP_K_RESULTS = 3  # Number of relevant chunks to retrieve
+SEARCH_CACHE_SIZE = 256  # Recent (query, k) search results kept until the index changes
+MIN_RELEVANCE = 0.35  # Best chunk's cosine similarity needed before calling the LLM
+ANSWER_CACHE_SIZE = 128  # Answers kept per index version for repeated questions
 
 # LLM Settings
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
@@ -40,6 +62,9 @@ MAX_TOKENS = 1000
 PAGE_TITLE = "RAG Knowledge Base Chatbot"
 PAGE_ICON = "🤖"
 LAYOUT = "wide"
+CHAT_HISTORY_WINDOW = 30  # Number of most recent messages rendered by default
+CHAT_HISTORY_MAX = 200  # Messages kept in session state; the full transcript lives in SESSIONS_DIR
+STREAM_FLUSH_MS = int(os.getenv("STREAM_FLUSH_MS", "33"))  # Minimum time between streamed UI updates
 
 # RAG Prompt Template
 RAG_PROMPT_TEMPLATE = """You are an intelligent assistant helping to answer questions based on a knowledge base.
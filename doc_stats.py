@@ -0,0 +1,114 @@
+"""
+Document statistics for the knowledge base folder
+
+Only depends on the standard library and config, so the UI can show stats
+without importing the document processing stack.
+"""
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator
+
+import config
+
+_SUPPORTED_EXTENSIONS = frozenset(config.SUPPORTED_EXTENSIONS)
+
+
+def get_document_stats(directory: Path = None) -> Dict:
+    """
+    Get statistics about documents in the directory
+    
+    Kept out of document_processor so callers don't import the document
+    loaders and text splitters just to read stats.
+    
+    Args:
+        directory: Directory to analyze
+        
+    Returns:
+        Dictionary with document statistics
+    """
+    if directory is None:
+        directory = config.DOCUMENTS_DIR
+    
+    directory_str = str(directory)
+    stats = _compute_stats(directory_str, _dir_signature(directory_str))
+    # The cached dict is shared, so callers get their own copy
+    return {**stats, 'by_type': dict(stats['by_type'])}
+
+
+def _dir_signature(directory: str) -> int:
+    """
+    Change signature for the supported files in a directory tree
+    
+    Hashes each file's path, size and mtime, so additions, removals,
+    renames and in-place edits all change it. The stat() results come
+    from os.scandir entries, which usually have them cached already.
+    
+    Args:
+        directory: Root of the tree
+        
+    Returns:
+        Hash of the files' paths, sizes and mtimes
+    """
+    signature = []
+    for entry in _scan_files(directory):
+        if os.path.splitext(entry.name)[1].lower() in _SUPPORTED_EXTENSIONS:
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            signature.append((entry.path, st.st_size, st.st_mtime_ns))
+    return hash(tuple(signature))
+
+
+def _scan_files(directory: str) -> Iterator[os.DirEntry]:
+    """
+    Recursively yield the files below a directory
+    
+    os.scandir entries carry the file type from the directory listing and
+    cache their stat() result, avoiding extra syscalls per file.
+    
+    Args:
+        directory: Root of the tree
+        
+    Yields:
+        DirEntry for each regular file (nothing if the directory is missing)
+    """
+    try:
+        it = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan_files(entry.path)
+            elif entry.is_file():
+                yield entry
+
+
+@lru_cache(maxsize=8)
+def _compute_stats(directory_str: str, signature: int) -> Dict:
+    """
+    Compute document statistics, memoized on the directory's signature
+    
+    Args:
+        directory_str: Directory to analyze
+        signature: Value of _dir_signature() for the directory (cache key only)
+        
+    Returns:
+        Dictionary with document statistics
+    """
+    stats = {
+        'total_files': 0,
+        'by_type': {},
+        'total_size_mb': 0
+    }
+    
+    for entry in _scan_files(directory_str):
+        ext = os.path.splitext(entry.name)[1].lower()
+        if ext in _SUPPORTED_EXTENSIONS:
+            stats['total_files'] += 1
+            stats['by_type'][ext] = stats['by_type'].get(ext, 0) + 1
+            stats['total_size_mb'] += entry.stat().st_size / (1024 * 1024)
+    
+    return stats
@@ -2,8 +2,16 @@
 Document processing module for loading and chunking documents
 """
 import os
+import re
+import hashlib
+import json
+import multiprocessing
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 import logging
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -15,6 +23,13 @@ from langchain_community.document_loaders import (
 from langchain.schema import Document
 
 import config
+from doc_stats import get_document_stats
+
+# Extensions chunked with the regex splitter instead of RecursiveCharacterTextSplitter
+FAST_SPLIT_EXTENSIONS = frozenset(['.txt', '.md'])
+
+# Extensions whose parsing is slow enough to be worth a worker process
+PARALLEL_EXTENSIONS = frozenset(['.pdf', '.docx'])
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +39,14 @@ logger = logging.getLogger(__name__)
 class DocumentProcessor:
     """Handles document loading, processing, and chunking"""
     
+    # Loader factory per file extension; markdown is loaded as plain text
+    _LOADERS = {
+        '.pdf': PyPDFLoader,
+        '.txt': partial(TextLoader, encoding='utf-8'),
+        '.md': partial(TextLoader, encoding='utf-8'),
+        '.docx': Docx2txtLoader,
+    }
+    
     def __init__(self, chunk_size: int = config.CHUNK_SIZE, 
                  chunk_overlap: int = config.CHUNK_OVERLAP):
         """
@@ -41,32 +64,39 @@ class DocumentProcessor:
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
+        # Plain text and markdown use a single compiled pattern instead:
+        # paragraph breaks, sentence ends and line breaks are split points
+        self.fast_splitter = re.compile(r"\n\n+|(?<=[.!?])\s+|\n")
         
-    def load_document(self, file_path: Path) -> List[Document]:
+    @staticmethod
+    def load_document(file_path: Path, errors: Optional[List[str]] = None) -> Iterable[Document]:
         """
         Load a document based on its file extension
         
+        PDFs are returned as a lazy iterator over pages so a large file is
+        never held in memory as one Document per page.
+        
         Args:
             file_path: Path to the document
+            errors: Optional list that receives str(file_path) if the loader
+                fails (for PDFs, once the pages have been consumed), so a
+                broken file can be told apart from one without text
             
         Returns:
-            List of Document objects
+            Iterable of Document objects
         """
         extension = file_path.suffix.lower()
         
+        loader_cls = DocumentProcessor._LOADERS.get(extension)
+        if loader_cls is None:
+            logger.warning(f"Unsupported file type: {extension}")
+            return []
+        
         try:
+            loader = loader_cls(str(file_path))
+            
             if extension == '.pdf':
-                loader = PyPDFLoader(str(file_path))
-            elif extension == '.txt':
-                loader = TextLoader(str(file_path), encoding='utf-8')
-            elif extension == '.md':
-                # Load markdown files as text
-                loader = TextLoader(str(file_path), encoding='utf-8')
-            elif extension == '.docx':
-                loader = Docx2txtLoader(str(file_path))
-            else:
-                logger.warning(f"Unsupported file type: {extension}")
-                return []
+                return DocumentProcessor._lazy_pages(loader, file_path, errors)
             
             documents = loader.load()
             logger.info(f"Successfully loaded: {file_path.name}")
@@ -74,14 +104,143 @@ class DocumentProcessor:
             
         except Exception as e:
             logger.error(f"Error loading {file_path.name}: {str(e)}")
+            if errors is not None:
+                errors.append(str(file_path))
             return []
     
-    def load_documents_from_directory(self, directory: Path) -> List[Document]:
+    @staticmethod
+    def _lazy_pages(loader, file_path: Path,
+                    errors: Optional[List[str]] = None) -> Iterator[Document]:
+        """Yield pages from a loader one at a time, logging parse errors"""
+        try:
+            yield from loader.lazy_load()
+            logger.info(f"Successfully loaded: {file_path.name}")
+        except Exception as e:
+            logger.error(f"Error loading {file_path.name}: {str(e)}")
+            if errors is not None:
+                errors.append(str(file_path))
+    
+    @staticmethod
+    def _list_files(directory: Path) -> List[Path]:
+        """List all supported files below a directory"""
+        return [
+            p for p in directory.rglob("*")
+            if p.is_file() and p.suffix.lower() in config.SUPPORTED_EXTENSIONS
+        ]
+    
+    @staticmethod
+    def _file_sha256(file_path: Path) -> str:
+        """Hash a file's contents"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _load_manifest(self) -> Dict[str, List]:
+        """
+        Load the manifest of indexed files
+        
+        Returns:
+            Dictionary mapping file path to [mtime_ns, size, sha256]
+        """
+        try:
+            with open(config.MANIFEST_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest: {str(e)}")
+            return {}
+    
+    def save_manifest(self, manifest: Dict[str, List]):
+        """
+        Persist the manifest once its files have been indexed
+        
+        Args:
+            manifest: Manifest returned by scan_changes()
+        """
+        config.MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(config.MANIFEST_PATH, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+    
+    def scan_changes(self, directory: Path = None,
+                     full: bool = False) -> Tuple[List[Path], List[str], Dict[str, List]]:
+        """
+        Compare the documents directory against the manifest of indexed files
+        
+        Files whose mtime and size match the manifest are skipped without
+        being read; otherwise the content hash decides.
+        
+        Args:
+            directory: Directory to scan (defaults to config.DOCUMENTS_DIR)
+            full: If True, ignore the manifest and report every file as changed
+            
+        Returns:
+            Tuple of (new or changed paths, sources of removed files, updated manifest)
+        """
+        if directory is None:
+            directory = config.DOCUMENTS_DIR
+        
+        previous = {} if full else self._load_manifest()
+        manifest = {}
+        changed = []
+        
+        if directory.exists():
+            for file_path in self._list_files(directory):
+                key = str(file_path)
+                stat = file_path.stat()
+                entry = previous.get(key)
+                
+                if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                    manifest[key] = entry
+                    continue
+                
+                sha = self._file_sha256(file_path)
+                manifest[key] = [stat.st_mtime_ns, stat.st_size, sha]
+                if not entry or entry[2] != sha:
+                    changed.append(file_path)
+        
+        removed = [key for key in previous if key not in manifest]
+        logger.info(f"Scan found {len(changed)} new/changed and {len(removed)} removed file(s)")
+        return changed, removed, manifest
+    
+    def restore_failed(self, manifest: Dict[str, List], failed: List[str],
+                       full: bool = False):
+        """
+        Undo the manifest update for files whose loader failed
+        
+        A file that failed to load keeps its previous entry (or gets none),
+        so the next scan reports it as changed again instead of recording
+        it as indexed. Files that loaded but contain no text are recorded
+        normally.
+        
+        Args:
+            manifest: Manifest returned by scan_changes(), updated in place
+            failed: Sources reported by process_documents(failed=...)
+            full: Same as for scan_changes(); the saved manifest is ignored
+        """
+        if not failed:
+            return
+        
+        previous = {} if full else self._load_manifest()
+        for key in failed:
+            if key in previous:
+                manifest[key] = previous[key]
+            else:
+                manifest.pop(key, None)
+        logger.warning(f"{len(failed)} file(s) failed to load and will be retried: "
+                       f"{', '.join(os.path.basename(key) for key in failed)}")
+    
+    def load_documents_from_directory(self, directory: Path,
+                                      paths: Optional[List[Path]] = None) -> List[Document]:
         """
         Load all supported documents from a directory
         
         Args:
             directory: Path to the directory containing documents
+            paths: Only load these files (e.g. from scan_changes()) instead of
+                every supported file in the directory
             
         Returns:
             List of all loaded Document objects
@@ -92,82 +251,200 @@ class DocumentProcessor:
             logger.warning(f"Directory does not exist: {directory}")
             return all_documents
         
-        for file_path in directory.rglob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in config.SUPPORTED_EXTENSIONS:
-                docs = self.load_document(file_path)
-                all_documents.extend(docs)
+        if paths is None:
+            paths = self._list_files(directory)
+        
+        for file_path in paths:
+            all_documents.extend(self.load_document(file_path))
         
         logger.info(f"Loaded {len(all_documents)} document(s) from {directory}")
         return all_documents
     
-    def chunk_documents(self, documents: List[Document]) -> List[Document]:
+    def chunk_documents(self, documents: Iterable[Document]) -> List[Document]:
         """
         Split documents into smaller chunks
         
+        Documents are consumed one at a time, so a lazy iterator (e.g. the
+        pages of a PDF) is never materialized in full.
+        
+        Chunks repeated within the same source file (page headers, footers,
+        boilerplate) are kept once; the pages they also appeared on are
+        listed in the kept chunk's "pages" metadata.
+        
         Args:
-            documents: List of Document objects to chunk
+            documents: Iterable of Document objects to chunk
             
         Returns:
             List of chunked Document objects
         """
-        if not documents:
+        chunks = []
+        seen = {}
+        count = 0
+        duplicates = 0
+        for doc in documents:
+            count += 1
+            source = doc.metadata.get("source", "Unknown")
+            for text in self._split_text(doc):
+                key = (source, _content_hash(text))
+                index = seen.get(key)
+                if index is None:
+                    seen[key] = len(chunks)
+                    chunks.append(Document(page_content=text, metadata=dict(doc.metadata)))
+                    continue
+                
+                duplicates += 1
+                if "page" in doc.metadata:
+                    kept = chunks[index].metadata
+                    # Chroma metadata values must be scalars, so pages are a string
+                    pages = kept.get("pages") or str(kept.get("page"))
+                    kept["pages"] = f"{pages},{doc.metadata['page']}"
+        
+        if not count:
             logger.warning("No documents to chunk")
             return []
         
-        chunks = self.text_splitter.split_documents(documents)
-        logger.info(f"Created {len(chunks)} chunks from {len(documents)} document(s)")
+        logger.info(f"Created {len(chunks)} chunks from {count} document(s), "
+                    f"skipped {duplicates} duplicate(s)")
         return chunks
     
-    def process_documents(self, directory: Path = None) -> List[Document]:
+    def _process_file(self, file_path: Path) -> Tuple[List[Document], bool]:
         """
-        Complete pipeline: load and chunk documents
+        Load and chunk a single file, streaming its pages into the splitter
         
         Args:
-            directory: Directory containing documents (defaults to config.DOCUMENTS_DIR)
+            file_path: File to process
             
         Returns:
-            List of chunked Document objects ready for embedding
+            Tuple of (chunks, whether the loader failed)
         """
-        if directory is None:
-            directory = config.DOCUMENTS_DIR
+        errors = []
+        chunks = self.chunk_documents(self.load_document(file_path, errors))
+        return chunks, bool(errors)
+    
+    def _split_text(self, doc: Document) -> List[str]:
+        """Split one document's text with the splitter for its file type"""
+        extension = os.path.splitext(doc.metadata.get("source", ""))[1].lower()
+        if extension in FAST_SPLIT_EXTENSIONS:
+            return self._fast_chunk(doc.page_content, self.chunk_size, self.chunk_overlap)
+        return self.text_splitter.split_text(doc.page_content)
+    
+    def _fast_chunk(self, text: str, size: int, overlap: int) -> List[str]:
+        """
+        Split text into chunks of at most `size` characters
         
-        logger.info("Starting document processing pipeline...")
-        documents = self.load_documents_from_directory(directory)
+        Break points come from one pass of the precompiled fast_splitter;
+        each chunk ends at the last break that fits, falling back to the
+        last space and then to a hard cut. The next chunk starts at the
+        first break within the trailing `overlap` characters.
         
-        if not documents:
-            logger.warning("No documents loaded. Please add documents to the documents/ folder.")
-            return []
+        Args:
+            text: Text to split
+            size: Maximum chunk length
+            overlap: Maximum overlap between consecutive chunks
+            
+        Returns:
+            List of chunk strings
+        """
+        breaks = [m.end() for m in self.fast_splitter.finditer(text)]
+        chunks = []
+        start = 0
+        length = len(text)
+        
+        while start < length:
+            limit = start + size
+            if limit >= length:
+                cut = length
+            else:
+                i = bisect_right(breaks, limit) - 1
+                if i >= 0 and breaks[i] > start:
+                    cut = breaks[i]
+                else:
+                    space = text.rfind(" ", start + 1, limit)
+                    cut = space + 1 if space > start else limit
+            
+            chunk = text[start:cut].strip()
+            if chunk:
+                chunks.append(chunk)
+            if cut >= length:
+                break
+            
+            # Start the next chunk on a break inside the overlap window
+            i = bisect_left(breaks, cut - overlap)
+            start = breaks[i] if i < len(breaks) and start < breaks[i] < cut else cut
         
-        chunks = self.chunk_documents(documents)
         return chunks
     
-    def get_document_stats(self, directory: Path = None) -> Dict:
+    def process_documents(self, directory: Path = None,
+                          paths: Optional[List[Path]] = None,
+                          failed: Optional[List[str]] = None) -> List[Document]:
         """
-        Get statistics about documents in the directory
+        Complete pipeline: load and chunk documents
         
         Args:
-            directory: Directory to analyze
+            directory: Directory containing documents (defaults to config.DOCUMENTS_DIR)
+            paths: Only process these files instead of the whole directory
+            failed: Optional list that receives the sources of files whose
+                loader failed; their partial chunks are left out
             
         Returns:
-            Dictionary with document statistics
+            List of chunked Document objects ready for embedding
         """
         if directory is None:
             directory = config.DOCUMENTS_DIR
         
-        stats = {
-            'total_files': 0,
-            'by_type': {},
-            'total_size_mb': 0
-        }
+        logger.info("Starting document processing pipeline...")
         
-        for file_path in directory.rglob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in config.SUPPORTED_EXTENSIONS:
-                stats['total_files'] += 1
-                ext = file_path.suffix.lower()
-                stats['by_type'][ext] = stats['by_type'].get(ext, 0) + 1
-                stats['total_size_mb'] += file_path.stat().st_size / (1024 * 1024)
+        if paths is None:
+            if not directory.exists():
+                logger.warning(f"Directory does not exist: {directory}")
+                return []
+            paths = self._list_files(directory)
         
-        return stats
+        errors = []
+        chunks = []
+        pool_paths = [p for p in paths if p.suffix.lower() in PARALLEL_EXTENSIONS]
+        if len(pool_paths) >= config.PARALLEL_LOAD_MIN_FILES:
+            # PDF and DOCX parsing is CPU-bound and independent per file. Workers
+            # are spawned rather than forked since the app process may hold
+            # running threads; each re-imports the loaders, so plain text files,
+            # which parse faster than that, stay inline. Each worker chunks its
+            # own file, so only chunks cross back.
+            workers = min(len(pool_paths), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                for path, (file_chunks, file_failed) in zip(pool_paths, executor.map(self._process_file, pool_paths)):
+                    chunks.extend(file_chunks)
+                    if file_failed:
+                        errors.append(str(path))
+            pooled = set(pool_paths)
+            paths = [p for p in paths if p not in pooled]
+        
+        if paths:
+            pages = chain.from_iterable(self.load_document(p, errors) for p in paths)
+            chunks.extend(self.chunk_documents(pages))
+        
+        if errors:
+            # Pages read before a PDF broke would replace the file's full chunks
+            broken = set(errors)
+            chunks = [c for c in chunks if c.metadata.get("source") not in broken]
+            if failed is not None:
+                failed.extend(errors)
+        
+        if not chunks:
+            logger.warning("No documents loaded. Please add documents to the documents/ folder.")
+            return []
+        
+        return chunks
+    
+    @staticmethod
+    def get_document_stats(directory: Path = None) -> Dict:
+        """Get statistics about documents in the directory (see doc_stats.get_document_stats())"""
+        return get_document_stats(directory)
+
+
+def _content_hash(text: str) -> bytes:
+    """Short digest used to detect repeated chunk text"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,213 @@
+"""
+Embedding models used by VectorStoreManager
+
+SentenceEmbeddings runs the sentence transformer with PyTorch (the default).
+OnnxEmbeddings runs an int8-quantized export with ONNX Runtime on CPU and is
+used when config.EMBEDDING_BACKEND is "onnx"; the model has to be exported
+once with build_quantized_model() (needs the optional `optimum` and
+`onnxruntime` packages).
+"""
+import logging
+import os
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import config
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows in float32, whatever precision the model ran in"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+class SentenceEmbeddings(Embeddings):
+    """Sentence transformer embeddings computed without autograd bookkeeping"""
+
+    def __init__(self, model_name: str = config.EMBEDDING_MODEL_NAME,
+                 device: str = "cpu",
+                 batch_size: int = config.EMBEDDING_BATCH_SIZE):
+        """
+        Load the model
+
+        Args:
+            model_name: Name of the sentence transformer model
+            device: Torch device to run on
+            batch_size: Number of texts per forward pass
+        """
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        self._torch = torch
+        self.batch_size = batch_size
+        # Same attribute name as HuggingFaceEmbeddings, for .half() and
+        # the multi-GPU pool in VectorStoreManager
+        self.client = SentenceTransformer(model_name, device=device)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts under torch.inference_mode()
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            (N, D) float32 matrix of unit-length embeddings
+        """
+        with self._torch.inference_mode():
+            vectors = self.client.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=False
+            )
+        # Normalized here so fp16 models still get fp32 unit vectors
+        return _normalize(vectors)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents for storage"""
+        return self._encode(texts).tolist()
+
+    def embed_documents_multi_gpu(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents with one encoder process per visible CUDA device
+
+        Output matches embed_documents(): fp32 vectors normalized here,
+        whatever precision the worker processes ran in.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding per text
+        """
+        pool = self.client.start_multi_process_pool()
+        try:
+            vectors = self.client.encode_multi_process(
+                texts, pool, batch_size=self.batch_size, normalize_embeddings=False
+            )
+        finally:
+            self.client.stop_multi_process_pool(pool)
+        return _normalize(vectors).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single search query"""
+        return self._encode([text])[0].tolist()
+
+
+def build_quantized_model(model_name: str = config.EMBEDDING_MODEL_NAME,
+                          output_dir: Path = config.ONNX_MODEL_DIR) -> Path:
+    """
+    Export a sentence transformer to ONNX and quantize its weights to int8
+
+    Args:
+        model_name: Sentence transformer to export
+        output_dir: Directory receiving the tokenizer and ONNX files
+
+    Returns:
+        Path of the quantized model
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoTokenizer
+
+    if "/" not in model_name:
+        model_name = f"sentence-transformers/{model_name}"
+
+    output_dir = Path(output_dir)
+    ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+
+    quantized = output_dir / QUANTIZED_MODEL_FILE
+    quantize_dynamic(str(output_dir / "model.onnx"), str(quantized), weight_type=QuantType.QInt8)
+    logger.info(f"Quantized ONNX model written to {quantized}")
+    return quantized
+
+
+class OnnxEmbeddings(Embeddings):
+    """Mean-pooled, normalized sentence embeddings computed with ONNX Runtime"""
+
+    def __init__(self, model_dir: Path = config.ONNX_MODEL_DIR,
+                 batch_size: int = config.EMBEDDING_BATCH_SIZE,
+                 max_length: int = 256,
+                 num_threads: int = None):
+        """
+        Load the quantized model and its tokenizer
+
+        Args:
+            model_dir: Directory written by build_quantized_model()
+            batch_size: Number of texts per forward pass
+            max_length: Longest token sequence fed to the model
+            num_threads: Intra-op threads (defaults to the number of CPUs)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(model_dir / QUANTIZED_MODEL_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedding model from {model_dir}")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts in length-sorted batches
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            (N, D) float32 matrix of unit-length embeddings
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        result = [None] * len(texts)
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            tokens = self.tokenizer(
+                [texts[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            feed = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+
+            # Mean pooling over real tokens, then L2 normalization in fp32
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = _normalize((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+
+            for i, vector in zip(batch, pooled):
+                result[i] = vector
+
+        if not result:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(result).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents for storage"""
+        return self._encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single search query"""
+        return self._encode([text])[0].tolist()
@@ -2,6 +2,7 @@
 Quick Start Script for RAG Chatbot
 Initializes the system and tests basic functionality
 """
+import importlib.util
 import sys
 from pathlib import Path
 
@@ -20,10 +21,10 @@ def check_requirements():
     
     missing_packages = []
     for package in required_packages:
-        try:
-            __import__(package)
+        # Only asks the import system where the package lives; nothing is loaded
+        if importlib.util.find_spec(package) is not None:
             print(f"  ✅ {package}")
-        except ImportError:
+        else:
             print(f"  ❌ {package} - MISSING")
             missing_packages.append(package)
     
@@ -201,6 +202,9 @@ def main():
         print("\n❌ Please install requirements first!")
         sys.exit(1)
     
+    import config
+    config.ensure_dirs()
+    
     check_api_key()  # Warning only, not critical
     
     if not check_documents():
@@ -233,7 +237,7 @@ def main():
         print()
         print("💡 Tips:")
         print("  - Add your own documents to the documents/ folder")
-        print("  - Click '🔄 Rebuild DB' after adding new documents")
+        print("  - Click '🔄 Rebuild' after adding new documents")
         print("  - Configure OpenAI API key for better answers")
     else:
         print("⚠️  SOME CHECKS FAILED")
@@ -1,13 +1,17 @@
 """
 RAG Engine - Core retrieval-augmented generation logic
 """
+import asyncio
 import logging
-from typing import List, Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Iterator, Optional
 import os
 
 from langchain.schema import Document
 from langchain_openai import ChatOpenAI
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
 import config
@@ -18,6 +22,62 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Token endings that close a sentence or paragraph; flushing there keeps the
+# streamed markdown in complete blocks instead of re-rendering half sentences
+_BLOCK_ENDS = (".", "!", "?", ":", "\n")
+
+
+def _coalesce(tokens: Iterator[str], flush_ms: int = config.STREAM_FLUSH_MS,
+              max_hold_ms: int = config.STREAM_FLUSH_MS * 4) -> Iterator[str]:
+    """
+    Group streamed tokens so the UI re-renders once per block, not per token
+    
+    Tokens are flushed at the first sentence or paragraph end after flush_ms
+    has passed, or unconditionally once they have been held for max_hold_ms.
+    
+    Args:
+        tokens: Iterator of answer pieces
+        flush_ms: Minimum time between flushes at a block boundary
+        max_hold_ms: Maximum time to hold tokens without a block boundary
+        
+    Yields:
+        Concatenated batches of tokens
+    """
+    interval = flush_ms / 1000
+    max_hold = max_hold_ms / 1000
+    buf = []
+    last_flush = time.perf_counter()
+    
+    for token in tokens:
+        buf.append(token)
+        elapsed = time.perf_counter() - last_flush
+        at_boundary = token.rstrip(" ").endswith(_BLOCK_ENDS)
+        if (at_boundary and elapsed >= interval) or elapsed >= max_hold:
+            yield "".join(buf)
+            buf.clear()
+            last_flush = time.perf_counter()
+    
+    if buf:
+        yield "".join(buf)
+
+
+@lru_cache(maxsize=4)
+def _get_llm(model: str, temperature: float, max_tokens: int, api_key: str) -> ChatOpenAI:
+    """Chat model shared by all engines with the same settings (and HTTP pool)"""
+    return ChatOpenAI(
+        model_name=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        openai_api_key=api_key
+    )
+
+
+@lru_cache(maxsize=4)
+def _get_prompt(template: str) -> PromptTemplate:
+    """Parsed prompt template, shared by all engines"""
+    return PromptTemplate(template=template, input_variables=["context", "question"])
+
+
 class RAGEngine:
     """Main RAG engine for question answering"""
     
@@ -30,7 +90,7 @@ class RAGEngine:
         """
         self.vector_store_manager = vector_store_manager
         self.llm = None
-        self.qa_chain = None
+        self.prompt = None
         
         # Check if OpenAI API key is available
         self.use_openai = bool(config.OPENAI_API_KEY)
@@ -43,11 +103,11 @@ class RAGEngine:
     def _initialize_openai_llm(self):
         """Initialize OpenAI LLM"""
         try:
-            self.llm = ChatOpenAI(
-                model_name=config.LLM_MODEL,
-                temperature=config.LLM_TEMPERATURE,
-                max_tokens=config.MAX_TOKENS,
-                openai_api_key=config.OPENAI_API_KEY
+            self.llm = _get_llm(
+                config.LLM_MODEL,
+                config.LLM_TEMPERATURE,
+                config.MAX_TOKENS,
+                config.OPENAI_API_KEY
             )
             logger.info(f"OpenAI LLM initialized: {config.LLM_MODEL}")
         except Exception as e:
@@ -55,38 +115,32 @@ class RAGEngine:
             self.llm = None
     
     def setup_qa_chain(self):
-        """Setup the QA chain with retriever"""
+        """
+        Prepare the prompt used to answer from retrieved documents
+        
+        Retrieval is done by the query methods themselves (through the
+        vector store manager's search and caches), so the LLM always sees
+        exactly the chunks that were scored.
+        """
         if self.vector_store_manager.vectorstore is None:
             logger.error("Vector store not loaded")
             return False
         
-        # Create retriever
-        retriever = self.vector_store_manager.vectorstore.as_retriever(
-            search_kwargs={"k": config.TOP_K_RESULTS}
-        )
-        
-        # Create prompt template
-        prompt = PromptTemplate(
-            template=config.RAG_PROMPT_TEMPLATE,
-            input_variables=["context", "question"]
-        )
+        self.prompt = _get_prompt(config.RAG_PROMPT_TEMPLATE)
         
         if self.llm:
-            # Create QA chain with LLM
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=retriever,
-                return_source_documents=True,
-                chain_type_kwargs={"prompt": prompt}
-            )
-            logger.info("QA chain setup complete with LLM")
+            logger.info("QA setup complete with LLM")
         else:
             # Setup for retrieval-only mode
-            logger.info("QA chain setup in retrieval-only mode")
+            logger.info("QA setup in retrieval-only mode")
         
         return True
     
+    def _format_prompt(self, question: str, documents: List[Document]) -> str:
+        """Fill the prompt with the retrieved documents ("stuff" formatting)"""
+        context = "\n\n".join(doc.page_content for doc in documents)
+        return self.prompt.format(context=context, question=question)
+    
     def query(self, question: str) -> Dict:
         """
         Process a question and return an answer with sources
@@ -106,36 +160,29 @@ class RAGEngine:
         
         try:
             # Retrieve relevant documents
-            relevant_docs = self.vector_store_manager.similarity_search_with_score(
+            documents, scores = self.vector_store_manager.similarity_search_with_score(
                 question, 
                 k=config.TOP_K_RESULTS
             )
             
-            if not relevant_docs:
+            if not documents:
                 return {
                     "answer": "I couldn't find any relevant information in the knowledge base for your question.",
                     "source_documents": [],
                     "error": "No relevant documents found"
                 }
             
-            # Extract documents and scores
-            documents = [doc for doc, score in relevant_docs]
-            scores = [score for doc, score in relevant_docs]
-            
             # Generate answer
-            if self.qa_chain and self.llm:
-                # Use LLM to generate answer
-                response = self.qa_chain.invoke({"query": question})
-                answer = response["result"]
-                source_docs = response.get("source_documents", documents)
+            if self.llm and self.prompt and self._is_relevant(scores):
+                # Use LLM to generate answer from the scored documents
+                answer = self.llm.invoke(self._format_prompt(question, documents)).content
             else:
                 # Fallback: Return context without LLM generation
                 answer = self._generate_fallback_answer(question, documents)
-                source_docs = documents
             
             return {
                 "answer": answer,
-                "source_documents": source_docs,
+                "source_documents": documents,
                 "relevance_scores": scores,
                 "error": None
             }
@@ -148,9 +195,219 @@ class RAGEngine:
                 "error": str(e)
             }
     
+    async def aquery(self, question: str) -> Dict:
+        """
+        Async variant of query() for callers running an event loop
+        
+        A plain wrapper: retrieval and generation still run one after the
+        other, since the prompt needs the retrieved chunks. The blocking
+        similarity search runs in a worker thread so the loop stays free,
+        and the LLM is awaited with ainvoke(). Nothing in the app uses it;
+        the UI streams answers with stream().
+        
+        Args:
+            question: User's question
+            
+        Returns:
+            Dictionary containing answer and source documents
+        """
+        if not question or not question.strip():
+            return {
+                "answer": "Please provide a valid question.",
+                "source_documents": [],
+                "error": "Empty question"
+            }
+        
+        try:
+            documents, scores = await asyncio.to_thread(
+                self.vector_store_manager.similarity_search_with_score,
+                question,
+                config.TOP_K_RESULTS
+            )
+            
+            if not documents:
+                return {
+                    "answer": "I couldn't find any relevant information in the knowledge base for your question.",
+                    "source_documents": [],
+                    "error": "No relevant documents found"
+                }
+            
+            if self.llm and self.prompt and self._is_relevant(scores):
+                message = await self.llm.ainvoke(self._format_prompt(question, documents))
+                answer = message.content
+            else:
+                # Fallback: Return context without LLM generation
+                answer = self._generate_fallback_answer(question, documents)
+            
+            return {
+                "answer": answer,
+                "source_documents": documents,
+                "relevance_scores": scores,
+                "error": None
+            }
+            
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            return {
+                "answer": f"An error occurred while processing your question: {str(e)}",
+                "source_documents": [],
+                "error": str(e)
+            }
+    
+    def stream(self, question: str, response: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Process a question and stream the answer as it is generated
+        
+        Args:
+            question: User's question
+            response: Optional dictionary filled in with the answer, source
+                documents, relevance scores and error, as returned by query()
+            
+        Yields:
+            Pieces of the answer text
+        """
+        if response is None:
+            response = {}
+        response.update({"answer": "", "source_documents": [], "error": None})
+        
+        if not question or not question.strip():
+            response["error"] = "Empty question"
+            response["answer"] = "Please provide a valid question."
+            yield response["answer"]
+            return
+        
+        parts = []
+        try:
+            # Retrieve relevant documents
+            documents, scores = self.vector_store_manager.similarity_search_with_score(
+                question,
+                k=config.TOP_K_RESULTS
+            )
+            
+            if not documents:
+                response["error"] = "No relevant documents found"
+                response["answer"] = "I couldn't find any relevant information in the knowledge base for your question."
+                yield response["answer"]
+                return
+            response["source_documents"] = documents
+            response["relevance_scores"] = scores
+            
+            if self.llm and self.prompt and self._is_relevant(scores):
+                for chunk in self.llm.stream(self._format_prompt(question, documents)):
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield chunk.content
+            else:
+                # Fallback: Return context without LLM generation
+                parts.append(self._generate_fallback_answer(question, documents))
+                yield parts[-1]
+            
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            response["error"] = str(e)
+            parts.append(f"An error occurred while processing your question: {str(e)}")
+            yield parts[-1]
+        
+        response["answer"] = "".join(parts)
+    
+    def batch_query(self, questions: List[str]) -> List[Dict]:
+        """
+        Answer several questions at once
+        
+        Retrieval for all questions is one batched search; with an LLM the
+        prompts are sent concurrently with llm.batch().
+        
+        Args:
+            questions: User questions
+            
+        Returns:
+            One response dictionary per question, as returned by query()
+        """
+        responses = [None] * len(questions)
+        asked = []
+        for i, question in enumerate(questions):
+            if not question or not question.strip():
+                responses[i] = {
+                    "answer": "Please provide a valid question.",
+                    "source_documents": [],
+                    "error": "Empty question"
+                }
+            else:
+                asked.append(i)
+        
+        try:
+            results = self.vector_store_manager.similarity_search_batch(
+                [questions[i] for i in asked],
+                k=config.TOP_K_RESULTS
+            )
+            
+            found = []
+            for i, (documents, scores) in zip(asked, results):
+                if not documents:
+                    responses[i] = {
+                        "answer": "I couldn't find any relevant information in the knowledge base for your question.",
+                        "source_documents": [],
+                        "error": "No relevant documents found"
+                    }
+                    continue
+                responses[i] = {
+                    "answer": "",
+                    "source_documents": documents,
+                    "relevance_scores": scores,
+                    "error": None
+                }
+                found.append(i)
+            
+            if self.llm and self.prompt:
+                # Weak matches get the excerpt answer instead of an LLM call
+                weak = [i for i in found if not self._is_relevant(responses[i]["relevance_scores"])]
+                for i in weak:
+                    responses[i]["answer"] = self._generate_fallback_answer(
+                        questions[i], responses[i]["source_documents"]
+                    )
+                found = [i for i in found if i not in weak]
+                
+                prompts = [
+                    self._format_prompt(questions[i], responses[i]["source_documents"])
+                    for i in found
+                ]
+                if prompts:
+                    for i, message in zip(found, self.llm.batch(prompts)):
+                        responses[i]["answer"] = message.content
+            else:
+                for i in found:
+                    responses[i]["answer"] = self._generate_fallback_answer(
+                        questions[i], responses[i]["source_documents"]
+                    )
+            
+        except Exception as e:
+            logger.error(f"Error processing batch query: {str(e)}")
+            for i in asked:
+                if responses[i] is None or not responses[i]["answer"]:
+                    responses[i] = {
+                        "answer": f"An error occurred while processing your question: {str(e)}",
+                        "source_documents": [],
+                        "error": str(e)
+                    }
+        
+        return responses
+    
+    @staticmethod
+    def _is_relevant(scores) -> bool:
+        """
+        Whether the best retrieved chunk is similar enough to ask the LLM
+        
+        Scores are distances (1 - cosine similarity), so lower is better.
+        
+        Args:
+            scores: Distances of the retrieved chunks
+        """
+        return len(scores) > 0 and 1 - min(scores) >= config.MIN_RELEVANCE
+    
     def _generate_fallback_answer(self, question: str, documents: List[Document]) -> str:
         """
-        Generate a simple answer when LLM is not available
+        Generate a simple answer when LLM is not available or the retrieved
+        context is too weak to be worth an LLM call
         
         Args:
             question: User's question
@@ -165,7 +422,10 @@ class RAGEngine:
             content = doc.page_content[:300]  # Limit length
             answer += f"**Excerpt {i}:**\n{content}...\n\n"
         
-        answer += "\n*Note: Set up an OpenAI API key in the .env file to get AI-generated answers.*"
+        if self.llm:
+            answer += "\n*Note: No closely matching content was found, so no AI-generated answer was produced.*"
+        else:
+            answer += "\n*Note: Set up an OpenAI API key in the .env file to get AI-generated answers.*"
         return answer
     
     def get_chat_response(self, question: str, chat_history: Optional[List] = None) -> Dict:
@@ -192,6 +452,47 @@ class RAGManager:
         self.vector_store_manager = VectorStoreManager()
         self.rag_engine = None
         self.is_initialized = False
+        # Bumped whenever the index changes so cached answers go stale
+        self.index_version = 0
+        self._answer_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    def _cache_key(self, question: str):
+        """Cache key for a question: normalized text, top-k and index version"""
+        return (" ".join(question.lower().split()), config.TOP_K_RESULTS, self.index_version)
+    
+    def _cached_answer(self, key) -> Optional[Dict]:
+        """Return a copy of the cached response for a key, if any"""
+        with self._cache_lock:
+            response = self._answer_cache.get(key)
+            if response is None:
+                return None
+            self._answer_cache.move_to_end(key)
+        return dict(response)
+    
+    def _cache_answer(self, key, response: Dict):
+        """
+        Remember a successful response, evicting the least recently used
+        
+        Args:
+            key: Cache key taken before retrieval; if the index changed since,
+                the response came from the old index and is not stored
+            response: Response dictionary
+        """
+        if response.get("error"):
+            return
+        with self._cache_lock:
+            if key[-1] != self.index_version:
+                return
+            self._answer_cache[key] = dict(response)
+            if len(self._answer_cache) > config.ANSWER_CACHE_SIZE:
+                self._answer_cache.popitem(last=False)
+    
+    def _invalidate_answers(self):
+        """Start a new index version and drop all cached answers"""
+        with self._cache_lock:
+            self.index_version += 1
+            self._answer_cache.clear()
     
     def initialize(self, force_rebuild: bool = False) -> bool:
         """
@@ -204,12 +505,15 @@ class RAGManager:
             True if successful, False otherwise
         """
         try:
+            from document_processor import DocumentProcessor
+            
             # Load or create vector store
             if force_rebuild:
                 logger.info("Force rebuild requested. Creating new vector store...")
-                from document_processor import DocumentProcessor
                 processor = DocumentProcessor()
-                chunks = processor.process_documents()
+                paths, _, manifest = processor.scan_changes(full=True)
+                failed = []
+                chunks = processor.process_documents(paths=paths, failed=failed)
                 
                 if not chunks:
                     logger.error("No documents to process")
@@ -222,26 +526,34 @@ class RAGManager:
                     pass
                 
                 self.vector_store_manager.create_vectorstore(chunks)
+                processor.restore_failed(manifest, failed, full=True)
+                processor.save_manifest(manifest)
             else:
                 # Try to load existing vector store
                 vectorstore = self.vector_store_manager.load_vectorstore()
                 
                 if vectorstore is None:
                     logger.info("No existing vector store found. Creating new one...")
-                    from document_processor import DocumentProcessor
                     processor = DocumentProcessor()
-                    chunks = processor.process_documents()
+                    paths, _, manifest = processor.scan_changes(full=True)
+                    failed = []
+                    chunks = processor.process_documents(paths=paths, failed=failed)
                     
                     if not chunks:
                         logger.error("No documents to process")
                         return False
                     
                     self.vector_store_manager.create_vectorstore(chunks)
+                    processor.restore_failed(manifest, failed, full=True)
+                    processor.save_manifest(manifest)
+                elif not self.update_documents():
+                    return False
             
             # Initialize RAG engine
             self.rag_engine = RAGEngine(self.vector_store_manager)
             self.rag_engine.setup_qa_chain()
             
+            self._invalidate_answers()
             self.is_initialized = True
             logger.info("RAG system initialized successfully")
             return True
@@ -250,6 +562,39 @@ class RAGManager:
             logger.error(f"Error initializing RAG system: {str(e)}")
             return False
     
+    def update_documents(self) -> bool:
+        """
+        Re-index only the documents that were added, changed or removed
+        since the last indexing run
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            from document_processor import DocumentProcessor
+            processor = DocumentProcessor()
+            changed, removed, manifest = processor.scan_changes()
+            
+            if changed or removed:
+                # Chunks of changed files that kept their text are neither
+                # deleted nor re-embedded; removed files lose all their chunks
+                failed = []
+                chunks = processor.process_documents(paths=changed, failed=failed) if changed else []
+                # Files that failed to load keep their old chunks and are retried;
+                # files that loaded without text lose theirs
+                processor.restore_failed(manifest, failed)
+                stale = removed + [str(path) for path in changed if str(path) not in failed]
+                self.vector_store_manager.upsert_documents(chunks, replace_sources=stale)
+                
+                self._invalidate_answers()
+            
+            processor.save_manifest(manifest)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error updating documents: {str(e)}")
+            return False
+    
     def query(self, question: str) -> Dict:
         """
         Query the RAG system
@@ -267,7 +612,100 @@ class RAGManager:
                 "error": "Not initialized"
             }
         
-        return self.rag_engine.query(question)
+        key = self._cache_key(question)
+        cached = self._cached_answer(key)
+        if cached is not None:
+            return cached
+        
+        response = self.rag_engine.query(question)
+        self._cache_answer(key, response)
+        return response
+    
+    async def aquery(self, question: str) -> Dict:
+        """
+        Query the RAG system asynchronously (see RAGEngine.aquery())
+        
+        Args:
+            question: User's question
+            
+        Returns:
+            Response dictionary
+        """
+        if not self.is_initialized or self.rag_engine is None:
+            return {
+                "answer": "RAG system is not initialized. Please initialize first.",
+                "source_documents": [],
+                "error": "Not initialized"
+            }
+        
+        key = self._cache_key(question)
+        cached = self._cached_answer(key)
+        if cached is not None:
+            return cached
+        
+        response = await self.rag_engine.aquery(question)
+        self._cache_answer(key, response)
+        return response
+    
+    def batch_query(self, questions: List[str]) -> List[Dict]:
+        """
+        Query the RAG system with several questions at once
+        
+        Args:
+            questions: User questions
+            
+        Returns:
+            One response dictionary per question
+        """
+        if not self.is_initialized or self.rag_engine is None:
+            return [{
+                "answer": "RAG system is not initialized. Please initialize first.",
+                "source_documents": [],
+                "error": "Not initialized"
+            } for _ in questions]
+        
+        keys = [self._cache_key(question) for question in questions]
+        responses = [self._cached_answer(key) for key in keys]
+        missing = [i for i, response in enumerate(responses) if response is None]
+        if missing:
+            answered = self.rag_engine.batch_query([questions[i] for i in missing])
+            for i, response in zip(missing, answered):
+                responses[i] = response
+                self._cache_answer(keys[i], response)
+        
+        return responses
+    
+    def stream(self, question: str, response: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Query the RAG system and stream the answer
+        
+        Args:
+            question: User's question
+            response: Optional dictionary filled in with the answer, source
+                documents and error once streaming finishes
+            
+        Yields:
+            Pieces of the answer text
+        """
+        if not self.is_initialized or self.rag_engine is None:
+            message = "RAG system is not initialized. Please initialize first."
+            if response is not None:
+                response.update({"answer": message, "source_documents": [], "error": "Not initialized"})
+            yield message
+            return
+        
+        if response is None:
+            response = {}
+        
+        key = self._cache_key(question)
+        cached = self._cached_answer(key)
+        if cached is not None:
+            response.update(cached)
+            yield cached["answer"]
+            return
+        
+        yield from _coalesce(self.rag_engine.stream(question, response))
+        self._cache_answer(key, response)
 
 
 if __name__ == "__main__":
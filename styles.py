@@ -0,0 +1,10 @@
+"""
+Custom CSS for the Streamlit UI
+"""
+from pathlib import Path
+
+CSS_PATH = Path(__file__).parent / "static" / "style.css"
+
+# Read once at import so each rerun only re-sends the ready-made tag
+CSS = CSS_PATH.read_text(encoding="utf-8")
+STYLE_TAG = f"<style>{CSS}</style>"
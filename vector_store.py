@@ -1,12 +1,20 @@
 """
 Vector database management using ChromaDB
 """
+import hashlib
+import json
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import List, Optional
 from pathlib import Path
 
+import numpy as np
 from langchain.schema import Document
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import Chroma
 
 import config
@@ -15,6 +23,45 @@ import config
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Distance function of the collection; scores are 1 - cosine similarity
+DISTANCE_SPACE = "ip"
+
+
+def detect_device() -> str:
+    """
+    Pick the fastest available torch device for the embedding model
+    
+    Returns:
+        "cuda", "mps" or "cpu"
+    """
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    
+    if torch.cuda.is_available():
+        return "cuda"
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def _content_id(doc: Document) -> str:
+    """Stable id of a chunk: hash of its source path, page and text"""
+    meta = doc.metadata
+    key = f"{meta.get('source', '')}\0{meta.get('page', '')}\0{doc.page_content}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _cuda_device_count() -> int:
+    """Number of visible CUDA devices (0 without torch)"""
+    try:
+        import torch
+    except ImportError:
+        return 0
+    return torch.cuda.device_count()
+
 
 class VectorStoreManager:
     """Manages vector database operations for RAG"""
@@ -22,7 +69,9 @@ class VectorStoreManager:
     def __init__(self, 
                  embedding_model_name: str = config.EMBEDDING_MODEL_NAME,
                  persist_directory: Path = config.VECTOR_DB_DIR,
-                 collection_name: str = config.COLLECTION_NAME):
+                 collection_name: str = config.COLLECTION_NAME,
+                 device: str = config.EMBEDDING_DEVICE,
+                 batch_size: int = config.EMBEDDING_BATCH_SIZE):
         """
         Initialize the vector store manager
         
@@ -30,20 +79,100 @@ class VectorStoreManager:
             embedding_model_name: Name of the sentence transformer model
             persist_directory: Directory to persist the vector database
             collection_name: Name of the collection in ChromaDB
+            device: Torch device for the embedding model ("auto" to detect)
+            batch_size: Number of texts encoded per forward pass
         """
         self.embedding_model_name = embedding_model_name
         self.persist_directory = str(persist_directory)
         self.collection_name = collection_name
+        self.device = device
+        self.batch_size = batch_size
+        # Sidecar files live with the collection they mirror
+        self.sidecar_path = Path(self.persist_directory) / config.EMBEDDINGS_SIDECAR
+        self.sidecar_ids_path = Path(self.persist_directory) / config.EMBEDDINGS_SIDECAR_IDS
         
-        logger.info(f"Initializing embedding model: {embedding_model_name}")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=embedding_model_name,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+        # The model is loaded on first use (see the embeddings property)
+        self._embeddings = None
+        self._embeddings_lock = threading.Lock()
+        
+        # Per instance so the cache is tied to this embedding model
+        self._embed_query_cached = lru_cache(maxsize=config.QUERY_EMBEDDING_CACHE_SIZE)(
+            lambda text: tuple(self.embeddings.embed_query(text))
         )
         
         self.vectorstore: Optional[Chroma] = None
+        # (index, ids) for the in-process backend; swapped as one value so
+        # searches never see an index paired with another index's ids
+        self._ann = None
+        # (normalized query, k) -> (documents, scores); cleared on every change
+        self._search_cache = OrderedDict()
+        self._search_cache_lock = threading.Lock()
+        # Bumped on every clear; searches that started earlier don't store results
+        self._search_generation = 0
+        
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embedding model, loaded on first access"""
+        if self._embeddings is None:
+            with self._embeddings_lock:
+                if self._embeddings is None:
+                    self._embeddings = self._load_embeddings()
+        return self._embeddings
+    
+    def _load_embeddings(self) -> Embeddings:
+        """Load the sentence transformer onto the configured device"""
+        if config.EMBEDDING_BACKEND == "onnx":
+            from embeddings import OnnxEmbeddings
+            self.device = "cpu"
+            return OnnxEmbeddings(config.ONNX_MODEL_DIR, batch_size=self.batch_size)
         
+        if self.device == "auto":
+            self.device = detect_device()
+        
+        from embeddings import SentenceEmbeddings
+        logger.info(f"Initializing embedding model: {self.embedding_model_name} on {self.device}")
+        embeddings = SentenceEmbeddings(
+            self.embedding_model_name,
+            device=self.device,
+            batch_size=self.batch_size
+        )
+        
+        if self.device == "cuda" and config.EMBEDDING_FP16:
+            # Tensor cores run fp16 matmuls at roughly twice the fp32 rate
+            embeddings.client.half()
+        
+        return embeddings
+    
+    def _open_collection(self) -> Chroma:
+        """
+        Open (or create) the Chroma collection with inner-product distances
+        
+        An empty collection left over with another distance setting (e.g.
+        created by an older version) is dropped and recreated, since Chroma
+        only applies collection_metadata when a collection is first created.
+        
+        Returns:
+            Chroma vector store instance
+        """
+        def open_store():
+            return Chroma(
+                persist_directory=self.persist_directory,
+                embedding_function=self.embeddings,
+                collection_name=self.collection_name,
+                # Embeddings are unit length, so inner product ranks like cosine
+                # and needs one dot product per candidate
+                collection_metadata={"hnsw:space": DISTANCE_SPACE}
+            )
+        
+        store = open_store()
+        collection = store._collection
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if space != DISTANCE_SPACE and collection.count() == 0:
+            logger.info(f"Recreating empty {space} collection with {DISTANCE_SPACE} distances")
+            store.delete_collection()
+            store = open_store()
+        return store
+    
     def create_vectorstore(self, documents: List[Document]) -> Chroma:
         """
         Create a new vector store from documents
@@ -59,12 +188,14 @@ class VectorStoreManager:
         
         logger.info(f"Creating vector store with {len(documents)} documents...")
         
-        self.vectorstore = Chroma.from_documents(
-            documents=documents,
-            embedding=self.embeddings,
-            persist_directory=self.persist_directory,
-            collection_name=self.collection_name
-        )
+        self.vectorstore = self._open_collection()
+        # The sidecar has to mirror the whole collection, so it is only
+        # written alongside the vectors when the collection starts empty
+        fresh = self.vectorstore._collection.count() == 0
+        if not fresh:
+            self._invalidate_sidecar()
+        self._add_embedded(documents, write_sidecar=fresh)
+        self._build_ann_index()
         
         logger.info("Vector store created successfully")
         return self.vectorstore
@@ -78,11 +209,7 @@ class VectorStoreManager:
         """
         try:
             logger.info("Loading existing vector store...")
-            self.vectorstore = Chroma(
-                persist_directory=self.persist_directory,
-                embedding_function=self.embeddings,
-                collection_name=self.collection_name
-            )
+            self.vectorstore = self._open_collection()
             
             # Check if the collection has any data
             collection = self.vectorstore._collection
@@ -90,7 +217,13 @@ class VectorStoreManager:
                 logger.warning("Vector store is empty")
                 return None
             
+            space = (collection.metadata or {}).get("hnsw:space", "l2")
+            if space != DISTANCE_SPACE:
+                logger.warning(f"Vector store uses {space} distances; scores and "
+                               f"MIN_RELEVANCE assume {DISTANCE_SPACE}. Use Full Rebuild to fix this.")
+            
             logger.info(f"Vector store loaded successfully with {collection.count()} documents")
+            self._build_ann_index()
             return self.vectorstore
             
         except Exception as e:
@@ -110,9 +243,395 @@ class VectorStoreManager:
             return
         
         logger.info(f"Adding {len(documents)} documents to vector store...")
-        self.vectorstore.add_documents(documents)
+        self._add_embedded(documents)
+        self._invalidate_sidecar()
+        self._build_ann_index()
         logger.info("Documents added successfully")
     
+    def upsert_documents(self, documents: List[Document],
+                         replace_sources: Optional[List[str]] = None):
+        """
+        Store documents, embedding only chunks the collection doesn't have yet
+        
+        Chunks are keyed by a hash of their source and text, so re-indexing
+        an edited file only embeds the chunks whose text actually changed.
+        
+        Args:
+            documents: List of Document objects that should be stored
+            replace_sources: Source paths whose other existing chunks (those
+                not among documents) are deleted
+        """
+        if self.vectorstore is None:
+            if documents:
+                self.create_vectorstore(documents)
+            return
+        
+        collection = self.vectorstore._collection
+        ids = [_content_id(doc) for doc in documents]
+        
+        stale = []
+        if replace_sources:
+            wanted = set(ids)
+            old = collection.get(where={"source": {"$in": replace_sources}}, include=[])["ids"]
+            stale = [i for i in old if i not in wanted]
+            if stale:
+                collection.delete(ids=stale)
+        
+        existing = set(collection.get(ids=ids, include=[])["ids"]) if ids else set()
+        missing = [(i, doc) for i, doc in zip(ids, documents) if i not in existing]
+        if missing:
+            new_ids, new_docs = zip(*missing)
+            self._add_embedded(list(new_docs), list(new_ids))
+        
+        if stale or missing:
+            self._invalidate_sidecar()
+            self._build_ann_index()
+        logger.info(f"Upserted {len(documents)} chunks: {len(missing)} embedded, "
+                    f"{len(stale)} stale removed")
+    
+    def _add_embedded(self, documents: List[Document], ids: Optional[List[str]] = None,
+                      write_sidecar: bool = False):
+        """
+        Embed documents and write them to the collection in batches
+        
+        Texts are embedded in large slices on a worker thread while the
+        previous slice is written with a few large collection.add() calls,
+        so the encoder and the database work at the same time.
+        
+        Args:
+            documents: List of Document objects to embed and store
+            ids: Precomputed content ids (see _content_id), if already known
+            write_sidecar: Also write each slice into the float16 memmap
+                sidecar, replacing it (only valid if the collection was empty)
+            
+        Returns:
+            List of ids as written
+        """
+        if ids is None:
+            ids = [_content_id(doc) for doc in documents]
+        
+        # Similar lengths end up in the same encoder batch, so less padding
+        order = sorted(range(len(documents)), key=lambda i: len(documents[i].page_content))
+        documents = [documents[i] for i in order]
+        ids = [ids[i] for i in order]
+        
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        sidecar = None
+        
+        collection = self.vectorstore._collection
+        slice_size = config.EMBED_SLICE_SIZE
+        step = config.CHROMA_INSERT_BATCH_SIZE
+        
+        with ThreadPoolExecutor(max_workers=1) as executor, self._bulk_write_pragmas():
+            pending = executor.submit(self.encode_corpus, texts[:slice_size])
+            for start in range(0, len(texts), slice_size):
+                vectors = list(pending.result())
+                if start + slice_size < len(texts):
+                    # Embed the next slice while this one is written
+                    pending = executor.submit(
+                        self.encode_corpus, texts[start + slice_size:start + 2 * slice_size]
+                    )
+                
+                for i in range(0, len(vectors), step):
+                    j = start + i
+                    collection.add(
+                        ids=ids[j:j + step],
+                        embeddings=vectors[i:i + step],
+                        documents=texts[j:j + step],
+                        metadatas=metadatas[j:j + step]
+                    )
+                
+                if write_sidecar and vectors:
+                    # Rows go straight to disk, so the corpus is never held in memory
+                    try:
+                        if sidecar is None:
+                            sidecar = self._open_sidecar((len(texts), len(vectors[0])))
+                        sidecar[start:start + len(vectors)] = np.asarray(vectors, dtype=np.float16)
+                    except Exception as e:
+                        logger.error(f"Error writing embeddings sidecar: {str(e)}")
+                        write_sidecar, sidecar = False, None
+                        self._invalidate_sidecar()
+        
+        if sidecar is not None:
+            self._close_sidecar(sidecar, ids)
+        elif write_sidecar:
+            self._invalidate_sidecar()
+        return ids
+    
+    @contextmanager
+    def _bulk_write_pragmas(self):
+        """
+        Relax SQLite durability on this thread's Chroma connection during a bulk write
+        
+        synchronous=OFF skips an fsync per commit and temp_store=MEMORY keeps
+        sort/index scratch space off disk; the index can always be rebuilt
+        from the documents if the machine crashes mid-ingest. WAL journaling
+        and locking are left alone since the app may read concurrently.
+        Anything unexpected in Chroma's internals just skips the tuning.
+        """
+        cursor = None
+        previous = None
+        try:
+            from chromadb.db.impl.sqlite import SqliteDB
+            db = self.vectorstore._client._system.instance(SqliteDB)
+            # Chroma keeps one connection per thread; writes below run on this one
+            cursor = db._conn_pool.connect().cursor()
+            previous = cursor.execute("PRAGMA synchronous").fetchone()[0]
+            cursor.execute("PRAGMA synchronous = OFF")
+            cursor.execute("PRAGMA temp_store = MEMORY")
+        except Exception as e:
+            logger.debug(f"SQLite bulk-load tuning skipped: {str(e)}")
+            cursor = None
+        
+        try:
+            yield
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.execute(f"PRAGMA synchronous = {int(previous)}")
+                    cursor.execute("PRAGMA temp_store = DEFAULT")
+                except Exception as e:
+                    logger.warning(f"Could not restore SQLite settings: {str(e)}")
+    
+    def _write_sidecar(self, ids: List[str], embeddings):
+        """
+        Write the stored vectors to a float16 memmap next to the Chroma files
+        
+        Args:
+            ids: Chroma id of each vector
+            embeddings: Vectors in the same order as ids
+        """
+        if not len(ids):
+            self._invalidate_sidecar()
+            return
+        
+        try:
+            matrix = np.asarray(embeddings, dtype=np.float16)
+            fp = self._open_sidecar(matrix.shape)
+            fp[:] = matrix
+            self._close_sidecar(fp, ids)
+        except Exception as e:
+            logger.error(f"Error writing embeddings sidecar: {str(e)}")
+            self._invalidate_sidecar()
+    
+    def _open_sidecar(self, shape) -> np.memmap:
+        """
+        Create an empty float16 memmap sidecar of the given shape
+        
+        The id list is removed first, so a half-written memmap is never
+        mistaken for a valid one (see load_memmap()).
+        
+        Args:
+            shape: (number of vectors, dimensions)
+            
+        Returns:
+            Writable memmap
+        """
+        self.sidecar_ids_path.unlink(missing_ok=True)
+        return np.memmap(self.sidecar_path, dtype=np.float16, mode="w+", shape=tuple(shape))
+    
+    def _close_sidecar(self, fp: np.memmap, ids: List[str]):
+        """
+        Flush a memmap from _open_sidecar() and write its id list
+        
+        Args:
+            fp: Memmap whose rows are all written
+            ids: Chroma id of each row
+        """
+        try:
+            fp.flush()
+            with open(self.sidecar_ids_path, "w", encoding="utf-8") as f:
+                json.dump({"shape": list(fp.shape), "ids": ids}, f)
+        except Exception as e:
+            logger.error(f"Error writing embeddings sidecar: {str(e)}")
+            self._invalidate_sidecar()
+    
+    def _invalidate_sidecar(self):
+        """Remove the embeddings sidecar once it no longer matches the collection"""
+        self.sidecar_ids_path.unlink(missing_ok=True)
+        self.sidecar_path.unlink(missing_ok=True)
+    
+    def load_memmap(self):
+        """
+        Open the embeddings sidecar without reading it into memory
+        
+        Returns:
+            Tuple of (ids, read-only (N, D) float16 memmap), or None if there
+            is no sidecar
+        """
+        try:
+            with open(self.sidecar_ids_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            matrix = np.memmap(self.sidecar_path, dtype=np.float16, mode="r",
+                               shape=tuple(meta["shape"]))
+            return meta["ids"], matrix
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def _build_ann_index(self):
+        """
+        Build the in-process search index when config.VECTOR_BACKEND asks for one
+        
+        Vectors come from the memmap sidecar; if it is missing (e.g. after an
+        incremental update) it is regenerated from the collection first. On
+        any failure searches fall back to Chroma.
+        
+        Runs whenever the collection is created, loaded or changed, so it
+        also drops cached search results once the new index is in place.
+        """
+        try:
+            self._ann = self._load_ann_index()
+        finally:
+            self._clear_search_cache()
+    
+    def _load_ann_index(self):
+        """
+        Build the (index, ids) pair for the configured in-process backend
+        
+        Returns:
+            (index, ids), or None to search Chroma directly
+        """
+        if config.VECTOR_BACKEND == "chroma" or self.vectorstore is None:
+            return None
+        
+        try:
+            from ann_index import FaissIndex, HnswIndex
+            
+            sidecar = self.load_memmap()
+            if sidecar is None:
+                data = self.vectorstore._collection.get(include=["embeddings"])
+                self._write_sidecar(data["ids"], data["embeddings"])
+                sidecar = self.load_memmap()
+                if sidecar is None:
+                    return None
+            
+            ids, matrix = sidecar
+            if config.VECTOR_BACKEND == "faiss":
+                index = FaissIndex(matrix, int8=config.FAISS_INT8)
+            elif config.VECTOR_BACKEND == "hnswlib":
+                index = HnswIndex(matrix)
+            else:
+                raise ValueError(f"Unknown vector backend: {config.VECTOR_BACKEND}")
+            return index, ids
+        except Exception as e:
+            logger.error(f"Error building {config.VECTOR_BACKEND} index, using Chroma: {str(e)}")
+            return None
+    
+    def _ann_search(self, embedding: List[float], k: int):
+        """
+        Search the in-process index and fetch the hits from Chroma
+        
+        Args:
+            embedding: Query embedding
+            k: Number of results to return
+            
+        Returns:
+            Tuple of (documents, scores array), nearest first
+        """
+        return self._ann_search_batch([embedding], k)[0]
+    
+    def _ann_search_batch(self, embeddings, k: int):
+        """
+        Search the in-process index for several queries at once
+        
+        All hits are fetched from Chroma with a single get() call.
+        
+        Args:
+            embeddings: Query embeddings
+            k: Number of results per query
+            
+        Returns:
+            One (documents, scores array) tuple per query, nearest first
+        """
+        index, ids = self._ann
+        distances, positions = index.search(np.asarray(embeddings), k)
+        
+        wanted = list({ids[p] for row in positions for p in row if p >= 0})
+        data = self.vectorstore._collection.get(ids=wanted, include=["documents", "metadatas"])
+        by_id = {
+            i: Document(page_content=text, metadata=meta or {})
+            for i, text, meta in zip(data["ids"], data["documents"], data["metadatas"])
+        }
+        
+        results = []
+        for row_positions, row_distances in zip(positions, distances):
+            keep = [j for j, p in enumerate(row_positions) if p >= 0 and ids[p] in by_id]
+            results.append((
+                [by_id[ids[row_positions[j]]] for j in keep],
+                np.asarray(row_distances, dtype=np.float32)[keep]
+            ))
+        return results
+    
+    def _query_collection(self, embeddings, k: int):
+        """
+        Search the Chroma collection directly, keeping its columnar results
+        
+        Args:
+            embeddings: Query embeddings
+            k: Number of results per query
+            
+        Returns:
+            One (documents, scores array) tuple per query, nearest first
+        """
+        data = self.vectorstore._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            (
+                [Document(page_content=text, metadata=meta or {}) for text, meta in zip(texts, metas)],
+                np.asarray(dists, dtype=np.float32)
+            )
+            for texts, metas, dists in zip(data["documents"], data["metadatas"], data["distances"])
+        ]
+    
+    def encode_corpus(self, texts: List[str]):
+        """
+        Embed a batch of texts for storage
+        
+        With more than one CUDA device the texts are sharded across one
+        encoder process per GPU; otherwise the regular embedding model is used.
+        
+        Args:
+            texts: Chunk texts to embed
+            
+        Returns:
+            Sequence of normalized embedding vectors, one per text
+        """
+        embeddings = self.embeddings  # Resolves self.device on first use
+        if self.device != "cuda" or len(texts) < self.batch_size or _cuda_device_count() < 2:
+            return embeddings.embed_documents(texts)
+        return embeddings.embed_documents_multi_gpu(texts)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a search query, reusing the vector for repeated questions
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            Query embedding
+        """
+        return list(self._embed_query_cached(" ".join(query.split())))
+    
+    def delete_documents_by_source(self, sources: List[str]):
+        """
+        Delete all chunks that came from the given source files
+        
+        Args:
+            sources: Source paths as stored in the chunks' "source" metadata
+        """
+        if self.vectorstore is None or not sources:
+            return
+        
+        self.vectorstore._collection.delete(where={"source": {"$in": sources}})
+        self._invalidate_sidecar()
+        self._build_ann_index()
+        logger.info(f"Deleted chunks of {len(sources)} source(s) from vector store")
+    
     def similarity_search(self, query: str, k: int = config.TOP_K_RESULTS) -> List[Document]:
         """
         Search for similar documents based on a query
@@ -129,7 +648,10 @@ class VectorStoreManager:
             return []
         
         try:
-            results = self.vectorstore.similarity_search(query, k=k)
+            if self._ann is not None:
+                results = self._ann_search(self.embed_query(query), k)[0]
+            else:
+                results = self.vectorstore.similarity_search_by_vector(self.embed_query(query), k=k)
             logger.info(f"Found {len(results)} similar documents for query")
             return results
         except Exception as e:
@@ -140,29 +662,95 @@ class VectorStoreManager:
         """
         Search for similar documents with relevance scores
         
+        Results for a repeated (query, k) are served from a small LRU cache
+        until the collection changes. A search that was running while the
+        cache was cleared doesn't store its (possibly stale) result.
+        
         Args:
             query: Search query
             k: Number of results to return
             
         Returns:
-            List of tuples (Document, score)
+            Tuple of (documents, scores) where scores is a float32 array of
+            distances aligned with documents
         """
         if self.vectorstore is None:
             logger.error("No vector store loaded")
-            return []
+            return [], np.empty(0, dtype=np.float32)
+        
+        key = (" ".join(query.split()), k)
+        with self._search_cache_lock:
+            generation = self._search_generation
+            cached = self._search_cache.get(key)
+            if cached is not None:
+                self._search_cache.move_to_end(key)
+                return list(cached[0]), cached[1].copy()
         
         try:
-            results = self.vectorstore.similarity_search_with_score(query, k=k)
-            return results
+            if self._ann is not None:
+                documents, scores = self._ann_search(self.embed_query(query), k)
+            else:
+                documents, scores = self._query_collection([self.embed_query(query)], k)[0]
         except Exception as e:
             logger.error(f"Error during similarity search: {str(e)}")
+            return [], np.empty(0, dtype=np.float32)
+        
+        with self._search_cache_lock:
+            if generation != self._search_generation:
+                return documents, scores
+            self._search_cache[key] = (list(documents), scores.copy())
+            if len(self._search_cache) > config.SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+        return documents, scores
+    
+    def _clear_search_cache(self):
+        """Forget cached search results (the collection changed)"""
+        with self._search_cache_lock:
+            self._search_generation += 1
+            self._search_cache.clear()
+    
+    def similarity_search_batch(self, queries: List[str], k: int = config.TOP_K_RESULTS):
+        """
+        Search for several queries at once
+        
+        The queries are embedded in one encoder batch and searched with a
+        single index call.
+        
+        Args:
+            queries: Search queries
+            k: Number of results per query
+            
+        Returns:
+            One (documents, scores array) tuple per query
+        """
+        empty = [([], np.empty(0, dtype=np.float32)) for _ in queries]
+        if self.vectorstore is None:
+            logger.error("No vector store loaded")
+            return empty
+        if not queries:
             return []
+        
+        try:
+            embeddings = self.embeddings.embed_documents([" ".join(q.split()) for q in queries])
+            if self._ann is not None:
+                return self._ann_search_batch(embeddings, k)
+            return self._query_collection(embeddings, k)
+        except Exception as e:
+            logger.error(f"Error during batch similarity search: {str(e)}")
+            return empty
     
     def delete_collection(self):
-        """Delete the entire collection"""
+        """Delete the entire collection, including one that was never loaded"""
+        if self.vectorstore is None:
+            # Otherwise a rebuild would reopen the old collection, keeping
+            # its data and its distance settings
+            self.vectorstore = self._open_collection()
         if self.vectorstore is not None:
             self.vectorstore.delete_collection()
             self.vectorstore = None
+            self._ann = None
+            self._invalidate_sidecar()
+            self._clear_search_cache()
             logger.info("Vector store collection deleted")
     
     def get_collection_count(self) -> int: